@@ -2,106 +2,168 @@
 
 Actions:
 - Read CSVs from `data/raw/`.
-- Keep columns: review, rating, date, bank, source.
+- Keep columns: review_text, rating, review_date, bank_code, bank_name, source
+  (KEEP_COLUMNS; every output row has all of them, missing ones empty).
 - Remove duplicates and rows missing review text.
 - Normalize dates to YYYY-MM-DD.
-- Save to `data/processed/reviews_clean.csv`.
+- Save to `DATA_PATHS["processed_reviews"]` (data/processed/reviews_processed.csv).
+
+Raw files are processed in a process pool: each worker standardizes one file,
+drops in-file duplicates and splits its rows into hash partitions (by
+review text + bank) spilled to a temp directory. The merge then dedups one
+partition at a time, so a duplicate can only ever meet its twin inside the
+same partition and memory is bounded by the largest partition, not the
+whole dataset.
 """
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Optional
 import argparse
+import tempfile
 import pandas as pd
 import os
 
 # Import config for canonical data paths and bank mappings. Support running as script or package.
 try:
-    from config import APP_IDS, BANK_NAMES, DATA_PATHS
+    from config import APP_IDS, BANK_NAMES, DATA_PATHS, EXTRA_APP_IDS
 except Exception:
-    from ..src.config import APP_IDS, BANK_NAMES, DATA_PATHS
-
-
-def preprocess(raw_dir: Path, out_file: Path):
-    files = list(raw_dir.glob("*.csv"))
-    if not files:
-        print(f"No CSV files found in {raw_dir}")
-        return
-
-    dfs = []
-    for f in files:
-        df = pd.read_csv(f)
-        # Try to standardize columns
-        col_map = {}
-        if "content" in df.columns:
-            col_map["content"] = "review"
-        if "score" in df.columns:
-            col_map["score"] = "rating"
-        if "at" in df.columns:
-            col_map["at"] = "date"
-        df = df.rename(columns=col_map)
-
-        # Add bank/source information from filename if possible
-        bank_code = f.stem
-        # Try to map filename/app id to known bank code (APP_IDS values may be app ids)
-        # If filename contains an app id, try to invert APP_IDS
-        inv = {v: k for k, v in APP_IDS.items()}
-        if bank_code in inv:
-            bank_code = inv[bank_code]
-
+    from ..src.config import APP_IDS, BANK_NAMES, DATA_PATHS, EXTRA_APP_IDS
+
+
+KEEP_COLUMNS = ["review_text", "rating", "review_date", "bank_code", "bank_name", "source"]
+DEDUP_KEY = ["review_text", "bank_code"]
+
+# File stem -> bank code. Stems are app ids (crawl_scheduler writes
+# <app_id>__<country>_<lang>__<timestamp>.csv, scrape_reviews.py writes the
+# app id with dots replaced by underscores). Includes the scheduler's
+# CRAWL_EXTRA_APPS targets.
+ALL_APP_IDS = {**APP_IDS, **EXTRA_APP_IDS}
+BANK_BY_APP_ID = {v: k for k, v in ALL_APP_IDS.items()}
+BANK_BY_APP_ID.update({v.replace(".", "_"): k for k, v in ALL_APP_IDS.items()})
+
+
+def standardize(df: pd.DataFrame, stem: str) -> pd.DataFrame:
+    """Map one raw file onto the canonical columns."""
+    # Try to standardize columns
+    col_map = {}
+    if "content" in df.columns:
+        col_map["content"] = "review"
+    if "score" in df.columns:
+        col_map["score"] = "rating"
+    if "at" in df.columns:
+        col_map["at"] = "date"
+    df = df.rename(columns=col_map)
+
+    # Bank from the file's own bank_code column (crawl_scheduler writes one),
+    # otherwise from the filename
+    app_id = stem.split("__")[0]
+    bank_code = BANK_BY_APP_ID.get(app_id, app_id)
+
+    if "bank_code" in df.columns:
+        df["bank_code"] = df["bank_code"].fillna(bank_code)
+    else:
         df["bank_code"] = bank_code
-        df["bank_name"] = BANK_NAMES.get(bank_code, bank_code)
-        df["source"] = "google_play"
-
-        # Keep and standardize relevant columns
-        # Map common names to canonical names
-        col_map2 = {}
-        if "review" in df.columns and "review_text" not in df.columns:
-            col_map2["review"] = "review_text"
-        if "date" in df.columns and "review_date" not in df.columns:
-            col_map2["date"] = "review_date"
-        if "rating" in df.columns and "rating" not in df.columns:
-            col_map2["rating"] = "rating"
-        df = df.rename(columns=col_map2)
-
-        keep = [c for c in ["review_text", "rating", "review_date", "bank_code", "bank_name", "source"] if c in df.columns]
-        df = df[keep]
+    names = df["bank_code"].map(lambda code: BANK_NAMES.get(code, code))
+    df["bank_name"] = df["bank_name"].fillna(names) if "bank_name" in df.columns else names
+    df["source"] = "google_play"
 
-        dfs.append(df)
+    # Map common names to canonical names
+    col_map2 = {}
+    if "review" in df.columns and "review_text" not in df.columns:
+        col_map2["review"] = "review_text"
+    if "date" in df.columns and "review_date" not in df.columns:
+        col_map2["date"] = "review_date"
+    df = df.rename(columns=col_map2)
 
-    combined = pd.concat(dfs, ignore_index=True)
+    keep = [c for c in KEEP_COLUMNS if c in df.columns]
+    df = df[keep]
 
     # Drop rows missing review text
-    combined = combined.dropna(subset=["review"])
+    if "review_text" in df.columns:
+        df = df.dropna(subset=["review_text"])
+        df["review_text"] = df["review_text"].astype(str)
 
     # Normalize dates
-    if "date" in combined.columns:
-        combined["date"] = pd.to_datetime(combined["date"], errors="coerce").dt.strftime("%Y-%m-%d")
-
-    # Remove duplicates based on review text + bank
-    if "bank" in combined.columns:
-        combined = combined.drop_duplicates(subset=["review", "bank"])
-    else:
-        combined = combined.drop_duplicates(subset=["review"])
-
-    # Ensure dates normalized in final file
-    if "review_date" in combined.columns:
-        combined["review_date"] = pd.to_datetime(combined["review_date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    if "review_date" in df.columns:
+        df["review_date"] = (
+            pd.to_datetime(df["review_date"], errors="coerce", format="mixed").dt.strftime("%Y-%m-%d")
+        )
+    return df
+
+
+def process_file(path: Path, spill_dir: Path, n_partitions: int) -> int:
+    """
+    Worker: standardize + dedup one raw file and spill it into hash partitions.
+
+    Returns the number of rows written.
+    """
+    df = standardize(pd.read_csv(path), path.stem)
+    if df.empty or "review_text" not in df.columns:
+        return 0
+
+    df = df.drop_duplicates(subset=DEDUP_KEY)
+    part = pd.util.hash_pandas_object(df[DEDUP_KEY], index=False).to_numpy() % n_partitions
+
+    for p, chunk in df.groupby(part):
+        out = spill_dir / f"part-{p:04d}" / f"{path.stem}.csv"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        chunk.to_csv(out, index=False)
+    return len(df)
+
+
+def merge_partitions(spill_dir: Path, out_path: Path) -> int:
+    """Globally dedup each partition and append it to the output CSV."""
+    if out_path.exists():
+        out_path.unlink()
+
+    total = 0
+    for part_dir in sorted(spill_dir.glob("part-*")):
+        part = pd.concat(
+            (pd.read_csv(f, dtype={"review_text": str, "bank_code": str}) for f in sorted(part_dir.glob("*.csv"))),
+            ignore_index=True,
+        )
+        part = part.drop_duplicates(subset=DEDUP_KEY)
+        # Same columns in the same order for every partition: raw files may
+        # differ in schema and all partitions share the first one's header
+        part = part.reindex(columns=KEEP_COLUMNS)
+        part.to_csv(out_path, mode="a", header=total == 0, index=False)
+        total += len(part)
+    return total
+
+
+def preprocess(raw_dir: Path, out_file: Path, workers: Optional[int] = None, n_partitions: int = 16):
+    files = sorted(raw_dir.glob("*.csv"))
+    if not files:
+        print(f"No CSV files found in {raw_dir}")
+        return
 
     # Write to configured processed path if available
     processed_path = out_file
     if isinstance(DATA_PATHS, dict) and DATA_PATHS.get("processed_reviews"):
         processed_path = Path(DATA_PATHS["processed_reviews"])
-
     processed_path.parent.mkdir(parents=True, exist_ok=True)
-    combined.to_csv(processed_path, index=False)
-    print(f"Saved cleaned data ({len(combined)} rows) to {processed_path}")
+
+    with tempfile.TemporaryDirectory(prefix="preprocess_", dir=processed_path.parent) as tmp:
+        spill_dir = Path(tmp)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(process_file, f, spill_dir, n_partitions) for f in files]
+            staged = sum(f.result() for f in futures)
+
+        total = merge_partitions(spill_dir, processed_path)
+
+    print(f"Read {len(files)} raw file(s), {staged} rows after per-file dedup")
+    print(f"Saved cleaned data ({total} rows) to {processed_path}")
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--raw", default="data/raw/", help="Folder with raw CSVs")
     parser.add_argument("--out", default="data/processed/reviews_clean.csv", help="Output cleaned CSV")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--partitions", type=int, default=16, help="Hash partitions for the global dedup")
     args = parser.parse_args()
 
-    preprocess(Path(args.raw), Path(args.out))
+    preprocess(Path(args.raw), Path(args.out), workers=args.workers, n_partitions=args.partitions)
 
 
 if __name__ == "__main__":
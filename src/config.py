@@ -30,6 +30,29 @@ SCRAPING_CONFIG = {
     "max_retries": int(os.getenv("MAX_RETRIES", 3)),
 }
 
+# ---------- Crawl scheduler (app × country × lang) ----------
+
+# extra apps on top of APP_IDS, e.g. CRAWL_EXTRA_APPS="AWASH=com.awash.app,ABAY=com.abay.app"
+EXTRA_APP_IDS = {
+    code.strip(): app_id.strip()
+    for code, app_id in (
+        item.split("=", 1) for item in os.getenv("CRAWL_EXTRA_APPS", "").split(",") if "=" in item
+    )
+}
+
+CRAWL_CONFIG = {
+    "countries": os.getenv("CRAWL_COUNTRIES", SCRAPING_CONFIG["country"]).split(","),
+    "langs": os.getenv("CRAWL_LANGS", SCRAPING_CONFIG["lang"]).split(","),
+    "max_concurrency": int(os.getenv("CRAWL_MAX_CONCURRENCY", 4)),
+    # revisit a target once it has ~this many new reviews waiting
+    "target_new_per_crawl": int(os.getenv("CRAWL_TARGET_NEW", 50)),
+    "min_interval_hours": float(os.getenv("CRAWL_MIN_INTERVAL_H", 1)),
+    "max_interval_hours": float(os.getenv("CRAWL_MAX_INTERVAL_H", 24 * 14)),
+    "page_size": 200,
+    "max_pages": int(os.getenv("CRAWL_MAX_PAGES", 10)),
+    "state_path": os.getenv("CRAWL_STATE_PATH", "data/crawl_state.sqlite"),
+}
+
 DATA_PATHS = {
     "raw_dir": "data/raw",
     "raw_reviews": "data/raw/reviews_raw.csv",
@@ -37,6 +60,68 @@ DATA_PATHS = {
     "processed_dir": "data/processed",
     "processed_reviews": "data/processed/reviews_processed.csv",
     "sentiment_reviews": "data/processed/reviews_with_sentiment.csv",
+    "keywords": "data/processed/keywords_per_bank.csv",
+    "columnar_dir": "data/processed/columnar",
+    # vocab + CSR-style int32 token ids shared by all NLP stages
+    "token_cache_dir": "data/processed/token_cache",
+    # rows rejected by validation, with reason codes
+    "quarantine_dir": "data/quarantine",
+    # LSA vectors + IVF index for "find similar complaints"
+    "similarity_index_dir": "data/processed/similarity_index",
+    # streaming complaint clustering state + per-cluster outputs
+    "topics_dir": "data/processed/topics",
+}
+
+# ---------- Validation ----------
+
+VALIDATION_CONFIG = {
+    "rating_min": 1,
+    "rating_max": 5,
+    "max_text_length": int(os.getenv("MAX_REVIEW_LENGTH", 5000)),
+    # VARCHAR limits from create_tables.py
+    "max_lengths": {
+        "review_id": 200,
+        "user_name": 200,
+        "app_version": 50,
+        "sentiment": 50,
+    },
+}
+
+# ---------- Storage backend ----------
+
+STORAGE_CONFIG = {
+    # "postgres" (production) or "duckdb" (embedded, file-based, no server)
+    "backend": os.getenv("STORAGE_BACKEND", "postgres"),
+}
+
+# ---------- Similar-review search ----------
+
+SIMILARITY_CONFIG = {
+    "n_components": int(os.getenv("SIM_DIMENSIONS", 128)),  # SVD dimensions
+    "n_lists": int(os.getenv("SIM_LISTS", 0)),              # IVF clusters, 0 = ~sqrt(n_reviews)
+    "nprobe": int(os.getenv("SIM_NPROBE", 8)),              # clusters scanned per query
+    "fit_sample": 200_000,                                  # rows used to fit TF-IDF/SVD/k-means
+    "chunk_size": 50_000,
+}
+
+# ---------- Topic discovery ----------
+
+TOPIC_CONFIG = {
+    "n_clusters": int(os.getenv("TOPIC_CLUSTERS", 20)),
+    "n_features": 2 ** 17,   # token ids are folded into this many columns
+    "chunk_size": 20_000,    # reviews per partial_fit batch
+    "top_terms": 10,
+}
+
+# ---------- Sketch summaries (per bank × day) ----------
+
+SKETCH_CONFIG = {
+    "hll_precision": 12,        # 2^12 registers, ~1.6% error on distinct counts
+    "relative_accuracy": 0.01,  # quantiles within 1% of the true value
+    "cms_width": 2048,
+    "cms_depth": 4,
+    "top_k": 50,                # heavy-hitter keywords kept per sketch
+    "path": os.getenv("SKETCH_PATH", "data/processed/sketches.sqlite"),
 }
 
 # ---------- PostgreSQL DB config ----------
@@ -48,3 +133,19 @@ DB_CONFIG = {
     "user": os.getenv("DB_USER", "postgres"),
     "password": os.getenv("DB_PASSWORD", "Henzi19$"),  # ✅ default as requested
 }
+
+DB_POOL_CONFIG = {
+    "minconn": int(os.getenv("DB_POOL_MIN", 1)),
+    "maxconn": int(os.getenv("DB_POOL_MAX", 10)),
+}
+
+# ---------- Insights API ----------
+
+API_CONFIG = {
+    "host": os.getenv("API_HOST", "127.0.0.1"),
+    "port": int(os.getenv("API_PORT", 8000)),
+    "cache_max_entries": int(os.getenv("API_CACHE_MAX_ENTRIES", 512)),
+    "cache_ttl_seconds": float(os.getenv("API_CACHE_TTL", 300)),
+    # how often (at most) the data_loads table is polled for new loads
+    "version_check_seconds": float(os.getenv("API_VERSION_CHECK", 2)),
+}
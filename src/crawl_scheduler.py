@@ -0,0 +1,405 @@
+"""
+crawl_scheduler.py
+Freshness-driven crawling over an app × country × lang matrix.
+
+Every (app, country, lang) target lives in a small SQLite job table together
+with its observed review velocity (new reviews per day, smoothed). A target
+is due again once it is expected to have about `target_new_per_crawl` new
+reviews waiting, so busy apps are revisited within hours and quiet ones
+every couple of weeks. Due targets are crawled newest-first until the last
+review seen on the previous visit, with at most `max_concurrency` crawls in
+flight at once.
+
+A crawl that runs out of its `max_pages` budget first leaves the high-water
+mark where it was and records the window it did fetch (backlog_*); the next
+visits page through that window without counting it against the budget and
+keep going down to the old mark, which only moves once the backlog has been
+drained. The velocity estimate is left alone until then, since those
+crawls also return reviews older than the previous visit.
+
+New reviews are written to data/raw/<app_id>__<country>_<lang>__<timestamp>.csv.
+
+Usage:
+    python src/crawl_scheduler.py status
+    python src/crawl_scheduler.py run [--loop]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from google_play_scraper import reviews, Sort
+
+from config import APP_IDS, BANK_NAMES, CRAWL_CONFIG, DATA_PATHS, EXTRA_APP_IDS, SCRAPING_CONFIG
+
+
+DAY = 86400.0
+VELOCITY_SMOOTHING = 0.5  # weight of the newest observation in the EWMA
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_targets (
+    app_code TEXT NOT NULL,
+    app_id TEXT NOT NULL,
+    country TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    velocity REAL,              -- new reviews per day (EWMA), NULL until first crawl
+    last_crawl_at REAL,         -- unix time
+    next_due_at REAL NOT NULL,  -- unix time
+    last_review_id TEXT,
+    last_review_at TEXT,        -- ISO timestamp of the newest review seen
+    total_reviews INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    backlog_review_id TEXT,     -- newest review fetched by an unfinished (max_pages) crawl
+    backlog_until_at TEXT,      -- ... and the window [backlog_from_at, backlog_until_at]
+    backlog_from_at TEXT,       --     already saved from it
+    PRIMARY KEY (app_id, country, lang)
+);
+CREATE TABLE IF NOT EXISTS crawl_log (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    app_id TEXT, country TEXT, lang TEXT,
+    started_at REAL, finished_at REAL,
+    new_reviews INTEGER, status TEXT
+);
+"""
+
+
+def configured_apps() -> Dict[str, str]:
+    """APP_IDS plus EXTRA_APP_IDS (CRAWL_EXTRA_APPS="CODE=app.id,...")."""
+    return {**APP_IDS, **EXTRA_APP_IDS}
+
+
+class CrawlScheduler:
+    def __init__(self, state_path: str = CRAWL_CONFIG["state_path"]) -> None:
+        os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(state_path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self._migrate()
+
+        self.max_concurrency = CRAWL_CONFIG["max_concurrency"]
+        self.target_new = CRAWL_CONFIG["target_new_per_crawl"]
+        self.min_interval = CRAWL_CONFIG["min_interval_hours"] * 3600
+        self.max_interval = CRAWL_CONFIG["max_interval_hours"] * 3600
+        self.page_size = CRAWL_CONFIG["page_size"]
+        self.max_pages = CRAWL_CONFIG["max_pages"]
+        self.max_retries = SCRAPING_CONFIG["max_retries"]
+
+    # ---------- job table ----------
+
+    def _migrate(self) -> None:
+        """Add columns introduced after a state file was created."""
+        have = {row["name"] for row in self.db.execute("PRAGMA table_info(crawl_targets);")}
+        for col in ("backlog_review_id", "backlog_until_at", "backlog_from_at"):
+            if col not in have:
+                self.db.execute(f"ALTER TABLE crawl_targets ADD COLUMN {col} TEXT;")
+        self.db.commit()
+
+    def sync_targets(self) -> None:
+        """Add any new app × country × lang combination; new targets are due now."""
+        now = time.time()
+        rows = [
+            (code, app_id, country.strip(), lang.strip(), now)
+            for code, app_id in configured_apps().items()
+            for country in CRAWL_CONFIG["countries"]
+            for lang in CRAWL_CONFIG["langs"]
+        ]
+        self.db.executemany(
+            """
+            INSERT OR IGNORE INTO crawl_targets (app_code, app_id, country, lang, next_due_at)
+            VALUES (?, ?, ?, ?, ?);
+            """,
+            rows,
+        )
+        self.db.commit()
+
+    def due_targets(self, now: Optional[float] = None) -> List[sqlite3.Row]:
+        """
+        Targets whose next_due_at has passed, most new data expected first.
+        Never-crawled targets come before everything else.
+        """
+        now = time.time() if now is None else now
+        rows = self.db.execute(
+            "SELECT * FROM crawl_targets WHERE next_due_at <= ?;", (now,)
+        ).fetchall()
+
+        def expected_new(row: sqlite3.Row) -> float:
+            if row["velocity"] is None or row["last_crawl_at"] is None:
+                return float("inf")
+            return row["velocity"] * (now - row["last_crawl_at"]) / DAY
+
+        return sorted(rows, key=expected_new, reverse=True)
+
+    def next_interval(self, velocity: float) -> float:
+        """Seconds until the target should have ~target_new new reviews."""
+        if velocity <= 0:
+            return self.max_interval
+        interval = self.target_new / velocity * DAY
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    # ---------- crawling ----------
+
+    def crawl_target(self, target: sqlite3.Row) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Fetch reviews newer than the last one seen for this target.
+
+        Returns (new_reviews, complete); complete is False when max_pages
+        pages' worth of new reviews were fetched before reaching already-seen
+        ones. Reviews inside the window saved by an unfinished earlier crawl
+        are skipped and do not count against that budget.
+        """
+        last_id = target["last_review_id"]
+        last_at = target["last_review_at"]
+        skip_until = target["backlog_until_at"]
+        skip_from = target["backlog_from_at"]
+        token = None
+        new: List[Dict[str, Any]] = []
+
+        while len(new) < self.max_pages * self.page_size:
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    page, token = reviews(
+                        target["app_id"],
+                        lang=target["lang"],
+                        country=target["country"],
+                        sort=Sort.NEWEST,
+                        count=self.page_size,
+                        continuation_token=token,
+                    )
+                    break
+                except Exception as e:
+                    print(f"[WARN] {target['app_id']} {target['country']}/{target['lang']} "
+                          f"attempt {attempt}/{self.max_retries} failed: {e}")
+                    if attempt == self.max_retries:
+                        raise
+                    time.sleep(5)
+
+            if not page:
+                return new, True
+
+            for r in page:
+                at = r.get("at").isoformat() if r.get("at") else None
+                if r.get("reviewId") == last_id or (last_at and at and at <= last_at):
+                    return new, True
+                if skip_until and skip_from and at and skip_from <= at <= skip_until:
+                    continue  # already saved by the unfinished crawl
+                new.append(self._to_row(r, target, at))
+
+            if token is None:
+                return new, True
+            time.sleep(0.5)
+
+        return new, False
+
+    @staticmethod
+    def _to_row(r: Dict[str, Any], target: sqlite3.Row, at: Optional[str]) -> Dict[str, Any]:
+        code = target["app_code"]
+        return {
+            "review_id": r.get("reviewId", ""),
+            "review_text": r.get("content", ""),
+            "rating": r.get("score", None),
+            "review_date": at,
+            "user_name": r.get("userName", "Anonymous"),
+            "thumbs_up": r.get("thumbsUpCount", 0),
+            "reply_content": r.get("replyContent", None),
+            "bank_code": code,
+            "bank_name": BANK_NAMES.get(code, code),
+            "app_version": r.get("reviewCreatedVersion", ""),
+            "source": "Google Play",
+            "country": target["country"],
+            "lang": target["lang"],
+        }
+
+    def _save_raw(self, target: sqlite3.Row, rows: List[Dict[str, Any]]) -> str:
+        os.makedirs(DATA_PATHS["raw_dir"], exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        name = f"{target['app_id']}__{target['country']}_{target['lang']}__{stamp}.csv"
+        path = os.path.join(DATA_PATHS["raw_dir"], name)
+        df = pd.DataFrame(rows)
+        df["scraped_at"] = datetime.utcnow().isoformat()
+        df.to_csv(path, index=False)
+        return path
+
+    # ---------- bookkeeping ----------
+
+    def _observed_velocity(self, target: sqlite3.Row, rows: List[Dict[str, Any]],
+                           now: float) -> float:
+        if target["last_crawl_at"] is not None:
+            elapsed_days = max((now - target["last_crawl_at"]) / DAY, 1 / 24)
+            return len(rows) / elapsed_days
+
+        # first visit: estimate from the time span covered by the reviews we got
+        dates = pd.to_datetime([r["review_date"] for r in rows if r["review_date"]], errors="coerce")
+        dates = dates.dropna()
+        if len(dates) < 2:
+            return 0.0
+        span_days = max((dates.max() - dates.min()).total_seconds() / DAY, 1.0)
+        return len(dates) / span_days
+
+    def _record_success(self, target: sqlite3.Row, rows: List[Dict[str, Any]],
+                        started: float, complete: bool) -> None:
+        now = time.time()
+        draining = bool(target["backlog_until_at"]) or not complete
+        if target["velocity"] is None:
+            velocity = self._observed_velocity(target, rows, now)
+        elif draining:
+            # rows include reviews older than the last visit (the max_pages
+            # backlog), so they say nothing about the arrival rate
+            velocity = target["velocity"]
+        else:
+            observed = self._observed_velocity(target, rows, now)
+            velocity = VELOCITY_SMOOTHING * observed + (1 - VELOCITY_SMOOTHING) * target["velocity"]
+
+        # stopped at max_pages before the previous high-water mark: the target
+        # is busier than estimated, so come back soon
+        interval = self.min_interval if not complete else self.next_interval(velocity)
+
+        newest_id, newest_at = (rows[0]["review_id"], rows[0]["review_date"]) if rows else (None, None)
+        pending_id, pending_at = target["backlog_review_id"], target["backlog_until_at"]
+        if pending_at and (not newest_at or pending_at > newest_at):
+            newest_id, newest_at = pending_id, pending_at
+
+        if complete:
+            # everything down to the old mark is saved: move the mark, drop the backlog
+            mark = (newest_id, newest_at)
+            backlog = (None, None, None)
+        else:
+            # keep stopping at the old mark; remember the window fetched so far.
+            # If this crawl got below the earlier window the two are contiguous,
+            # otherwise the earlier one is simply fetched again later.
+            oldest_at = rows[-1]["review_date"] if rows else None
+            reached = bool(target["backlog_from_at"] and oldest_at and oldest_at < target["backlog_from_at"])
+            if not reached and rows:
+                newest_id, newest_at = rows[0]["review_id"], rows[0]["review_date"]
+            mark = (None, None)
+            backlog = (newest_id, newest_at, oldest_at)
+
+        self.db.execute(
+            """
+            UPDATE crawl_targets
+            SET velocity = ?, last_crawl_at = ?, next_due_at = ?,
+                last_review_id = COALESCE(?, last_review_id),
+                last_review_at = COALESCE(?, last_review_at),
+                backlog_review_id = ?, backlog_until_at = ?, backlog_from_at = ?,
+                total_reviews = total_reviews + ?, failures = 0
+            WHERE app_id = ? AND country = ? AND lang = ?;
+            """,
+            (
+                velocity, now, now + interval,
+                *mark, *backlog,
+                len(rows),
+                target["app_id"], target["country"], target["lang"],
+            ),
+        )
+        self._log(target, started, now, len(rows), "ok" if complete else "partial")
+
+    def _record_failure(self, target: sqlite3.Row, started: float) -> None:
+        now = time.time()
+        failures = target["failures"] + 1
+        backoff = min(self.max_interval, self.min_interval * (2 ** failures))
+        self.db.execute(
+            """
+            UPDATE crawl_targets SET failures = ?, next_due_at = ?
+            WHERE app_id = ? AND country = ? AND lang = ?;
+            """,
+            (failures, now + backoff, target["app_id"], target["country"], target["lang"]),
+        )
+        self._log(target, started, now, 0, "failed")
+
+    def _log(self, target: sqlite3.Row, started: float, finished: float,
+             new_reviews: int, status: str) -> None:
+        self.db.execute(
+            """
+            INSERT INTO crawl_log (app_id, country, lang, started_at, finished_at, new_reviews, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+            """,
+            (target["app_id"], target["country"], target["lang"], started, finished, new_reviews, status),
+        )
+        self.db.commit()
+
+    # ---------- main loop ----------
+
+    def run_once(self) -> int:
+        """Crawl every due target (bounded concurrency). Returns new review count."""
+        self.sync_targets()
+        due = self.due_targets()
+        if not due:
+            return 0
+
+        print(f"[INFO] {len(due)} target(s) due, up to {self.max_concurrency} at a time.")
+        total = 0
+        # SQLite is only touched from this thread; workers just fetch
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {pool.submit(self.crawl_target, t): (t, time.time()) for t in due}
+            for fut in as_completed(futures):
+                target, started = futures[fut]
+                label = f"{target['app_code']} {target['country']}/{target['lang']}"
+                try:
+                    rows, complete = fut.result()
+                except Exception as e:
+                    print(f"[ERROR] Giving up on {label} for now: {e}")
+                    self._record_failure(target, started)
+                    continue
+
+                if rows:
+                    path = self._save_raw(target, rows)
+                    print(f"[INFO] {label}: {len(rows)} new review(s) → {path}")
+                else:
+                    print(f"[INFO] {label}: no new reviews")
+                self._record_success(target, rows, started, complete)
+                total += len(rows)
+        return total
+
+    def seconds_until_next_due(self) -> float:
+        row = self.db.execute("SELECT MIN(next_due_at) FROM crawl_targets;").fetchone()
+        if row[0] is None:
+            return 0.0
+        return max(0.0, row[0] - time.time())
+
+    def status(self) -> pd.DataFrame:
+        df = pd.read_sql_query(
+            """
+            SELECT app_code, app_id, country, lang, velocity, total_reviews, failures,
+                   last_crawl_at, next_due_at
+            FROM crawl_targets ORDER BY next_due_at;
+            """,
+            self.db,
+        )
+        for col in ("last_crawl_at", "next_due_at"):
+            df[col] = pd.to_datetime(df[col], unit="s")
+        return df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Freshness-driven review crawler")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    run = sub.add_parser("run")
+    run.add_argument("--loop", action="store_true", help="keep running, sleeping until the next due target")
+    args = parser.parse_args()
+
+    scheduler = CrawlScheduler()
+    if args.command == "status":
+        scheduler.sync_targets()
+        print(scheduler.status().to_string(index=False))
+        return
+
+    while True:
+        total = scheduler.run_once()
+        print(f"[INFO] Crawl round finished: {total} new review(s).")
+        if not args.loop:
+            break
+        wait = scheduler.seconds_until_next_due()
+        print(f"[INFO] Next target due in {wait / 60:.1f} min.")
+        time.sleep(max(wait, 1.0))
+
+
+if __name__ == "__main__":
+    main()
@@ -34,13 +34,50 @@ def create_tables():
         app_version VARCHAR(50),
         sentiment VARCHAR(50),
         text_length INT,
+        themes TEXT,
         scraped_at TIMESTAMP
     );
     """
 
+    # older databases were created before the themes column existed
+    add_themes = "ALTER TABLE reviews ADD COLUMN IF NOT EXISTS themes TEXT;"
+
+    # --- KEYWORDS TABLE (TF-IDF keywords per bank from Task 2) ---
+    create_keywords = """
+    CREATE TABLE IF NOT EXISTS bank_keywords (
+        bank_id INT REFERENCES banks(bank_id),
+        keyword VARCHAR(200),
+        rank INT,
+        score DOUBLE PRECISION,
+        PRIMARY KEY (bank_id, keyword)
+    );
+    """
+
+    # --- DATA LOADS (one row per load, used for cache invalidation) ---
+    create_loads = """
+    CREATE TABLE IF NOT EXISTS data_loads (
+        load_id SERIAL PRIMARY KEY,
+        table_name VARCHAR(50),
+        row_count INT,
+        loaded_at TIMESTAMP DEFAULT NOW()
+    );
+    """
+
+    # --- INDEXES used by the insights API ---
+    create_indexes = """
+    CREATE INDEX IF NOT EXISTS idx_reviews_bank_date
+        ON reviews (bank_id, review_date DESC);
+    CREATE INDEX IF NOT EXISTS idx_reviews_bank_rating
+        ON reviews (bank_id, rating);
+    """
+
     try:
         cur.execute(create_banks)
         cur.execute(create_reviews)
+        cur.execute(add_themes)
+        cur.execute(create_keywords)
+        cur.execute(create_loads)
+        cur.execute(create_indexes)
         print("✅ Tables created successfully.")
     except Exception as e:
         print("❌ Error creating tables:", e)
@@ -3,8 +3,16 @@ db_connection.py
 PostgreSQL connection helper
 """
 
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import pandas as pd
 import psycopg2
-from config import DB_CONFIG
+from psycopg2.pool import ThreadedConnectionPool
+from config import DB_CONFIG, DB_POOL_CONFIG
+
+
+_pool = None
 
 
 def get_connection():
@@ -22,3 +30,79 @@ def get_connection():
     except Exception as e:
         print("❌ Failed to connect to PostgreSQL:", e)
         raise
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        try:
+            _pool = ThreadedConnectionPool(
+                DB_POOL_CONFIG["minconn"],
+                DB_POOL_CONFIG["maxconn"],
+                host=DB_CONFIG["host"],
+                port=DB_CONFIG["port"],
+                dbname=DB_CONFIG["dbname"],
+                user=DB_CONFIG["user"],
+                password=DB_CONFIG["password"],
+            )
+        except Exception as e:
+            print("❌ Failed to create PostgreSQL connection pool:", e)
+            raise
+    return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """Borrow an autocommit connection from the pool and give it back afterwards."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+
+
+def record_data_load(cur, table_name: str, row_count: int) -> None:
+    """
+    Append a row to data_loads so long-running readers (e.g. the insights API)
+    can tell that new data has arrived and drop their caches.
+    """
+    cur.execute(
+        "INSERT INTO data_loads (table_name, row_count) VALUES (%s, %s);",
+        (table_name, int(row_count)),
+    )
+
+
+def stream_query(sql: str, params: Optional[Dict[str, Any]] = None,
+                 chunk_size: int = 50_000, cursor_name: str = "stream_cursor") -> Iterator[pd.DataFrame]:
+    """
+    Run `sql` through a named (server-side) cursor and yield the result in
+    DataFrame chunks of at most `chunk_size` rows, so large tables never
+    have to fit in client memory.
+    """
+    conn = get_connection()
+    conn.autocommit = False  # named cursors only live inside a transaction
+    try:
+        with conn.cursor(name=cursor_name) as cur:
+            cur.itersize = chunk_size
+            cur.execute(sql, params or {})
+            cols = None
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if cols is None:
+                    cols = [c[0] for c in cur.description]
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=cols)
+        conn.rollback()  # read-only; just end the transaction
+    finally:
+        conn.close()
@@ -0,0 +1,61 @@
+"""
+insert_keywords.py
+Inserts TF-IDF keywords per bank (keywords_per_bank.csv) into PostgreSQL
+
+Each bank in the CSV has its keywords replaced as a set (delete + insert in
+one transaction), so keywords that dropped out of the ranking do not linger.
+"""
+
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from db_connection import get_connection, record_data_load
+from config import DATA_PATHS
+
+
+def insert_keywords():
+    df = pd.read_csv(DATA_PATHS["keywords"])
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    # keywords_per_bank.csv always has bank_name, bank_code is optional
+    cur.execute("SELECT bank_id, bank_code, bank_name FROM banks;")
+    rows = cur.fetchall()
+    by_code = {code: bid for bid, code, _ in rows}
+    by_name = {name: bid for bid, _, name in rows}
+
+    if "bank_code" in df.columns:
+        df["bank_id"] = df["bank_code"].map(by_code)
+    else:
+        df["bank_id"] = df["bank_name"].map(by_name)
+    df = df.dropna(subset=["bank_id"]).drop_duplicates(subset=["bank_id", "keyword"])
+    scores = df["score"] if "score" in df.columns else pd.Series(None, index=df.index, dtype=object)
+    rows = [
+        (int(bank_id), keyword, int(rank), None if pd.isna(score) else float(score))
+        for bank_id, keyword, rank, score in zip(df["bank_id"], df["keyword"], df["rank"], scores)
+    ]
+    bank_ids = sorted({row[0] for row in rows})
+
+    conn.autocommit = False
+    try:
+        cur.execute("DELETE FROM bank_keywords WHERE bank_id = ANY(%s);", (bank_ids,))
+        execute_values(
+            cur,
+            "INSERT INTO bank_keywords (bank_id, keyword, rank, score) VALUES %s;",
+            rows,
+        )
+        record_data_load(cur, "bank_keywords", len(rows))
+        conn.commit()
+        print(f"✅ Inserted {len(rows)} keyword rows for {len(bank_ids)} bank(s).")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error inserting keywords, rolled back: {e}")
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    insert_keywords()
@@ -1,11 +1,52 @@
 """
 insert_reviews.py
 Inserts cleaned + sentiment-labeled reviews into PostgreSQL
+
+The batch is validated up front (validation.py): rejected rows go to
+data/quarantine/insert_reviews_rejects.csv with reason codes, and the valid
+rows are inserted in pages with execute_values inside one transaction.
+The rows actually inserted are then merged into the "db" sketches
+(sketches.py).
 """
 
 import pandas as pd
-from db_connection import get_connection
+from psycopg2.extras import execute_values
+
+from db_connection import get_connection, record_data_load
 from config import DATA_PATHS
+from sketches import record_batch
+from validation import validate_reviews, write_quarantine
+
+
+INSERT_COLUMNS = [
+    "review_id", "bank_id", "review_text", "rating", "review_date",
+    "thumbs_up", "user_name", "reply", "app_version",
+    "sentiment", "text_length", "themes", "scraped_at",
+]
+
+PAGE_SIZE = 1000
+
+
+def to_insert_frame(df: pd.DataFrame, bank_map: dict) -> pd.DataFrame:
+    """Map a validated batch onto the reviews table columns (NaN -> NULL)."""
+    out = pd.DataFrame(index=df.index)
+    out["review_id"] = df["review_id"].astype(str)
+    out["bank_id"] = df["bank_code"].map(bank_map)
+    out["review_text"] = df["review_text"]
+    out["rating"] = df["rating"]
+    out["review_date"] = df["review_date"]
+    out["thumbs_up"] = df["thumbs_up"] if "thumbs_up" in df.columns else 0
+    out["user_name"] = df["user_name"] if "user_name" in df.columns else "Anonymous"
+    out["reply"] = df["reply"] if "reply" in df.columns else df.get("reply_content")
+    out["app_version"] = df.get("app_version")
+    out["sentiment"] = df.get("sentiment", df.get("sentiment_label"))
+    out["text_length"] = df.get("text_length")
+    out["themes"] = df.get("themes")
+    out["scraped_at"] = df.get("scraped_at")
+    for col in ("thumbs_up", "text_length"):  # INT columns; CSV floats like 3.0
+        out[col] = pd.to_numeric(out[col], errors="coerce").round().astype("Int64")
+    out = out[INSERT_COLUMNS].astype(object)
+    return out.where(out.notna(), None)
 
 
 def insert_reviews():
@@ -18,49 +59,38 @@ def insert_reviews():
     cur.execute("SELECT bank_id, bank_code FROM banks;")
     bank_map = {code: bid for bid, code in cur.fetchall()}
 
-    sql = """
-    INSERT INTO reviews (
-        review_id, bank_id, review_text, rating, review_date,
-        thumbs_up, user_name, reply, app_version,
-        sentiment, text_length, scraped_at
-    )
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ON CONFLICT (review_id) DO NOTHING;
+    valid, rejected = validate_reviews(df, known_banks=bank_map.keys())
+    write_quarantine(rejected, stage="insert_reviews")
+
+    sql = f"""
+    INSERT INTO reviews ({", ".join(INSERT_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (review_id) DO NOTHING
+    RETURNING review_id;
     """
 
-    success = 0
-    fail = 0
-
-    for _, row in df.iterrows():
-        try:
-            bank_id = bank_map[row["bank_code"]]
-
-            cur.execute(sql, (
-                row["review_id"],
-                bank_id,
-                row["review_text"],
-                row["rating"],
-                row["review_date"],
-                row.get("thumbs_up", 0),
-                row.get("user_name", "Anonymous"),
-                row.get("reply", None),
-                row.get("app_version", None),
-                row.get("sentiment", None),
-                row.get("text_length", None),
-                row.get("scraped_at", None)
-            ))
-            success += 1
-        except Exception as e:
-            fail += 1
-            print(f"❌ Insert failed for review_id={row['review_id']}: {e}")
-
-    conn.commit()
-    cur.close()
-    conn.close()
+    rows = list(to_insert_frame(valid, bank_map).itertuples(index=False, name=None))
+
+    conn.autocommit = False
+    try:
+        inserted = execute_values(cur, sql, rows, page_size=PAGE_SIZE, fetch=True)
+        record_data_load(cur, "reviews", len(inserted))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Insert failed, batch rolled back: {e}")
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    inserted_ids = {row[0] for row in inserted}
+    record_batch(valid[valid["review_id"].astype(str).isin(inserted_ids)], source="db")
 
     print(f"\n==== INSERT SUMMARY ====")
-    print(f"Inserted: {success}")
-    print(f"Failed:   {fail}")
+    print(f"Inserted:    {len(inserted)}")
+    print(f"Duplicates:  {len(rows) - len(inserted)}")
+    print(f"Quarantined: {len(rejected)}")
 
 
 if __name__ == "__main__":
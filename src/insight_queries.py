@@ -0,0 +1,65 @@
+"""
+insight_queries.py
+Named SQL queries behind the per-bank insights (ratings, sentiment,
+themes, keywords, recent reviews).
+
+All queries take psycopg2-style named parameters (%(bank_code)s, %(limit)s)
+and only touch one bank at a time, so they are served from the
+(bank_id, ...) indexes created in create_tables.py instead of scanning the
+whole reviews table.
+"""
+
+INSIGHT_QUERIES = {
+    "banks": """
+        SELECT b.bank_code, b.bank_name, b.app_id
+        FROM banks b
+        ORDER BY b.bank_code;
+    """,
+    "rating_distribution": """
+        SELECT r.rating, COUNT(*) AS count
+        FROM reviews r
+        JOIN banks b ON b.bank_id = r.bank_id
+        WHERE b.bank_code = %(bank_code)s
+        GROUP BY r.rating
+        ORDER BY r.rating;
+    """,
+    "sentiment_distribution": """
+        SELECT UPPER(r.sentiment) AS sentiment, COUNT(*) AS count
+        FROM reviews r
+        JOIN banks b ON b.bank_id = r.bank_id
+        WHERE b.bank_code = %(bank_code)s AND r.sentiment IS NOT NULL
+        GROUP BY UPPER(r.sentiment)
+        ORDER BY count DESC;
+    """,
+    "top_themes": """
+        SELECT TRIM(t.theme) AS theme, COUNT(*) AS count
+        FROM reviews r
+        JOIN banks b ON b.bank_id = r.bank_id
+        CROSS JOIN UNNEST(STRING_TO_ARRAY(r.themes, ',')) AS t(theme)
+        WHERE b.bank_code = %(bank_code)s AND TRIM(t.theme) <> ''
+        GROUP BY TRIM(t.theme)
+        ORDER BY count DESC
+        LIMIT %(limit)s;
+    """,
+    "top_keywords": """
+        SELECT k.keyword, k.rank, k.score
+        FROM bank_keywords k
+        JOIN banks b ON b.bank_id = k.bank_id
+        WHERE b.bank_code = %(bank_code)s
+        ORDER BY k.rank
+        LIMIT %(limit)s;
+    """,
+    "recent_reviews": """
+        SELECT r.review_id, r.review_text, r.rating, r.review_date,
+               r.sentiment, r.thumbs_up, r.app_version
+        FROM reviews r
+        JOIN banks b ON b.bank_id = r.bank_id
+        WHERE b.bank_code = %(bank_code)s
+        ORDER BY r.review_date DESC
+        LIMIT %(limit)s;
+    """,
+    # cheap: data_loads only gets one row per load
+    "data_version": """
+        SELECT COALESCE(MAX(load_id), 0) AS version FROM data_loads;
+    """,
+}
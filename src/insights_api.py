@@ -0,0 +1,287 @@
+"""
+insights_api.py
+Small read-only HTTP/JSON service for per-bank insights stored in PostgreSQL
+(or any other backend from storage.py).
+
+Endpoints:
+    GET /banks
+    GET /banks/<bank_code>/ratings
+    GET /banks/<bank_code>/sentiment
+    GET /banks/<bank_code>/themes?limit=10
+    GET /banks/<bank_code>/keywords?limit=10
+    GET /banks/<bank_code>/reviews?limit=10
+    GET /health
+    GET /stats          (request latency percentiles + cache hit rate)
+
+Responses are kept in an in-process LRU cache with a TTL. The cache is
+dropped as soon as a new row shows up in `data_loads` (written by the
+insert_* loaders), and every response carries an ETag so pollers can send
+If-None-Match and get a body-less 304.
+
+Usage:
+    python src/insights_api.py [--host 127.0.0.1] [--port 8000] [--backend duckdb]
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from config import API_CONFIG, STORAGE_CONFIG
+from storage import BACKENDS, StorageBackend, get_backend
+
+
+# resource name in the URL -> query name in INSIGHT_QUERIES
+BANK_RESOURCES = {
+    "ratings": "rating_distribution",
+    "sentiment": "sentiment_distribution",
+    "themes": "top_themes",
+    "keywords": "top_keywords",
+    "reviews": "recent_reviews",
+}
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+# --------------------------------------------------------------------
+# Cache
+# --------------------------------------------------------------------
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+    created: float
+
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl_seconds`."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Any, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry.created > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Any, value: CachedResponse) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# --------------------------------------------------------------------
+# Service
+# --------------------------------------------------------------------
+
+class InsightsService:
+    """Runs insight queries against a storage backend and caches the JSON."""
+
+    def __init__(self, backend: StorageBackend, cache: ResponseCache,
+                 version_check_seconds: float) -> None:
+        self.backend = backend
+        self.cache = cache
+        self.version_check_seconds = version_check_seconds
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+        self._version_lock = threading.Lock()
+        self.latencies_ms: deque = deque(maxlen=10_000)
+
+    def _run_query(self, name: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self.backend.query(name, params)
+
+    def refresh_version(self) -> None:
+        """Poll data_loads (rate-limited) and drop the cache when it moved."""
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_seconds:
+            return
+        with self._version_lock:
+            if now - self._version_checked_at < self.version_check_seconds:
+                return
+            version = self._run_query("data_version")[0]["version"]
+            if version != self._version:
+                if self._version is not None:
+                    print(f"[INFO] New data load detected (version {version}); clearing cache.")
+                self.cache.clear()
+                self._version = version
+            self._version_checked_at = now
+
+    def get(self, query_name: str, params: Dict[str, Any]) -> CachedResponse:
+        self.refresh_version()
+
+        # the data version is part of the key: a query that started before a
+        # new load was detected can only ever be served under the old version
+        key = (self._version, query_name, tuple(sorted(params.items())))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        rows = self._run_query(query_name, params)
+        body = json.dumps({"data": rows}, default=str).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        response = CachedResponse(etag=etag, body=body, created=time.monotonic())
+        self.cache.put(key, response)
+        return response
+
+    def record_latency(self, elapsed_ms: float) -> None:
+        self.latencies_ms.append(elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        samples = sorted(self.latencies_ms)
+
+        def pct(p: float) -> Optional[float]:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 3)
+
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            "requests": len(samples),
+            "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)},
+            "cache": {
+                "entries": len(self.cache),
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+                "hit_rate": round(self.cache.hits / lookups, 4) if lookups else None,
+            },
+            "data_version": self._version,
+        }
+
+
+# --------------------------------------------------------------------
+# HTTP layer
+# --------------------------------------------------------------------
+
+def parse_route(path: str, query: Dict[str, List[str]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Map a request path to (query_name, params).
+
+    Raises:
+        KeyError: unknown route
+        ValueError: bad query string
+    """
+    parts = [p for p in path.split("/") if p]
+
+    if parts == ["banks"]:
+        return "banks", {}
+
+    if len(parts) == 3 and parts[0] == "banks" and parts[2] in BANK_RESOURCES:
+        query_name = BANK_RESOURCES[parts[2]]
+        params: Dict[str, Any] = {"bank_code": parts[1]}
+        if query_name in ("top_themes", "top_keywords", "recent_reviews"):
+            limit = int(query.get("limit", [DEFAULT_LIMIT])[0])
+            if limit < 1:
+                raise ValueError("limit must be >= 1")
+            params["limit"] = min(limit, MAX_LIMIT)
+        return query_name, params
+
+    raise KeyError(path)
+
+
+class InsightsRequestHandler(BaseHTTPRequestHandler):
+    service: InsightsService  # set by make_server()
+
+    def _send(self, status: int, body: bytes = b"", etag: Optional[str] = None) -> None:
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if body:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        self._send(status, json.dumps(payload, default=str).encode("utf-8"))
+
+    def do_GET(self) -> None:  # noqa: N802 (http.server naming)
+        start = time.perf_counter()
+        url = urlparse(self.path)
+
+        try:
+            if url.path == "/health":
+                self._send_json(200, {"status": "ok"})
+                return
+            if url.path == "/stats":
+                self._send_json(200, self.service.stats())
+                return
+
+            query_name, params = parse_route(url.path, parse_qs(url.query))
+            response = self.service.get(query_name, params)
+
+            if self.headers.get("If-None-Match") == response.etag:
+                self._send(304, etag=response.etag)
+            else:
+                self._send(200, response.body, etag=response.etag)
+        except KeyError:
+            self._send_json(404, {"error": f"unknown route {url.path}"})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            print(f"[ERROR] {self.path}: {e}")
+            self._send_json(500, {"error": "internal error"})
+        finally:
+            self.service.record_latency((time.perf_counter() - start) * 1000)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # dashboards poll frequently; keep the console quiet
+        pass
+
+
+def make_server(host: str, port: int, backend: StorageBackend) -> ThreadingHTTPServer:
+    cache = ResponseCache(API_CONFIG["cache_max_entries"], API_CONFIG["cache_ttl_seconds"])
+    service = InsightsService(backend, cache, API_CONFIG["version_check_seconds"])
+    handler = type("Handler", (InsightsRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve bank insights as JSON")
+    parser.add_argument("--host", default=API_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=API_CONFIG["port"])
+    parser.add_argument("--backend", default=STORAGE_CONFIG["backend"], choices=sorted(BACKENDS))
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+    server = make_server(args.host, args.port, backend)
+    print(f"[INFO] Insights API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Shutting down.")
+    finally:
+        server.server_close()
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+keywords.py
+Task 2 – TF-IDF keywords per bank, computed from the shared token cache
+instead of re-tokenizing the review text. Reviews in --csv that are not
+cached yet are tokenized into it first.
+
+Output: data/processed/keywords_per_bank.csv
+        (bank_code, bank_name, keyword, rank, score)
+
+Usage:
+    python src/keywords.py [--top-n 20] [--csv data/processed/reviews_processed.csv]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfTransformer
+
+from config import DATA_PATHS
+from preprocessing import TokenCache, build_token_cache
+
+
+def keywords_per_bank(cache: TokenCache, top_n: int = 20, min_df: int = 2) -> pd.DataFrame:
+    """Rank each bank's vocabulary by mean TF-IDF weight over its reviews."""
+    counts = cache.count_matrix()
+    tfidf = TfidfTransformer(sublinear_tf=True).fit_transform(counts).tocsr()
+
+    # drop stop words, numbers, very short and very rare tokens
+    doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+    vocab = np.array(cache.vocab, dtype=object)
+    usable = np.array([
+        len(tok) > 2 and not tok.isdigit() and tok not in ENGLISH_STOP_WORDS
+        for tok in vocab
+    ], dtype=bool) & (doc_freq >= min_df)
+
+    rows = []
+    meta = cache.meta
+    for (bank_code, bank_name), idx in meta.groupby(["bank_code", "bank_name"]).indices.items():
+        scores = np.asarray(tfidf[idx].mean(axis=0)).ravel()
+        scores[~usable] = 0.0
+        top = np.argsort(-scores)[:top_n]
+        for rank, tid in enumerate(top[scores[top] > 0], start=1):
+            rows.append({
+                "bank_code": bank_code,
+                "bank_name": bank_name,
+                "keyword": vocab[tid],
+                "rank": rank,
+                "score": float(scores[tid]),
+            })
+
+    return pd.DataFrame(rows, columns=["bank_code", "bank_name", "keyword", "rank", "score"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TF-IDF keywords per bank")
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--csv", default=DATA_PATHS["processed_reviews"], help="reviews to cache first")
+    args = parser.parse_args()
+
+    cache = build_token_cache(pd.read_csv(args.csv))
+    df = keywords_per_bank(cache, top_n=args.top_n)
+    df.to_csv(DATA_PATHS["keywords"], index=False)
+    print(f"Saved → {DATA_PATHS['keywords']} ({len(df)} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,47 @@
 Task 1 – Preprocessing for Google Play Reviews
 Usage:
     python src/preprocessing.py
+
+Besides the cleaned CSV, this builds the shared token cache used by every
+NLP stage (sentiment, TF-IDF keywords, themes, dedup):
+
+    data/processed/token_cache/
+        vocab.txt     one token per line, line number = token id
+        offsets.npy   int64, len = n_reviews + 1
+        tokens.npy    int32 token ids of all reviews, back to back
+        meta.csv      review key, review_id, bank_code, bank_name, review_date
+        manifest.json format, rows, tokens and vocab size of the last complete write
+
+Review i's tokens are tokens[offsets[i]:offsets[i + 1]] (CSR layout). The
+arrays are memory-mapped on load, so stages read them without copying, and
+reviews already in the cache are never tokenized again.
+
+The cache only ever grows, and manifest.json is written last: a load reads
+exactly the rows the manifest records, so a write interrupted between files
+can never pair one file's rows with another's.
 """
 
+import json
 import os
+from typing import Dict, List, Optional
+
+import numpy as np
 import pandas as pd
-from config import DATA_PATHS
+from nltk.tokenize import RegexpTokenizer
+from scipy import sparse
+
+from config import BANK_NAMES, DATA_PATHS
+from validation import validate_reviews, write_quarantine
+
+
+# letters and digits in any script (Amharic, accented Latin, ...), with an
+# optional apostrophe suffix ("don't")
+TOKENIZER = RegexpTokenizer(r"[^\W_]+(?:'[^\W_]+)?")
+
+# bump when the key or the tokenizer changes: older caches are rebuilt
+CACHE_FORMAT = 2
+
+META_COLUMNS = ["key", "review_id", "bank_code", "bank_name", "review_date"]
 
 
 def clean_text(text):
@@ -17,32 +53,231 @@ def clean_text(text):
     return text
 
 
+def normalize_text(text) -> str:
+    """clean_text + lowercase; the form every NLP stage tokenizes."""
+    return clean_text(text).lower()
+
+
+def tokenize(text) -> List[str]:
+    return TOKENIZER.tokenize(normalize_text(text))
+
+
+def review_keys(df: pd.DataFrame) -> pd.Series:
+    """
+    Stable key per review: a hash of bank_code + normalized review_text.
+
+    The same for every input, whether or not it carries review_id
+    (scripts/preprocess.py drops it), so a review is cached once.
+    review_id is kept in the cache meta only.
+    """
+    bank = df["bank_code"].astype(str) if "bank_code" in df.columns else ""
+    text = df["review_text"].map(normalize_text)
+    hashed = pd.util.hash_pandas_object(bank + "\x1f" + text, index=False)
+    return hashed.map("{:016x}".format)
+
+
+# --------------------------------------------------------------------
+# Token cache
+# --------------------------------------------------------------------
+
+class TokenCache:
+    """Read access to a token cache directory (see module docstring)."""
+
+    def __init__(self, vocab: List[str], offsets: np.ndarray, tokens: np.ndarray,
+                 meta: pd.DataFrame) -> None:
+        self.vocab = vocab
+        self.offsets = offsets
+        self.tokens = tokens
+        self.meta = meta
+        self._token_to_id: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def load(cls, cache_dir: str = DATA_PATHS["token_cache_dir"], mmap: bool = True) -> "TokenCache":
+        manifest_path = os.path.join(cache_dir, "manifest.json")
+        if not os.path.exists(os.path.join(cache_dir, "offsets.npy")):
+            raise FileNotFoundError(
+                f"Token cache not found in {cache_dir}. Run src/preprocessing.py first."
+            )
+        if not os.path.exists(manifest_path):
+            raise ValueError(f"Token cache in {cache_dir} has no manifest (older format); rebuild it.")
+        with open(manifest_path, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        if manifest.get("format") != CACHE_FORMAT:
+            raise ValueError(
+                f"Token cache in {cache_dir} is format {manifest.get('format')}, "
+                f"expected {CACHE_FORMAT}; rebuild it."
+            )
+
+        mode = "r" if mmap else None
+        with open(os.path.join(cache_dir, "vocab.txt"), encoding="utf-8") as fh:
+            vocab = fh.read().split("\n")[:-1]
+        offsets = np.load(os.path.join(cache_dir, "offsets.npy"), mmap_mode=mode)
+        tokens = np.load(os.path.join(cache_dir, "tokens.npy"), mmap_mode=mode)
+        meta = pd.read_csv(os.path.join(cache_dir, "meta.csv"), dtype={"key": str, "review_id": str})
+
+        # files may already hold rows of a write that never reached the
+        # manifest; they only ever grow, so their prefix is the last good state
+        rows, n_tokens, n_vocab = manifest["rows"], manifest["tokens"], manifest["vocab"]
+        if (len(offsets) < rows + 1 or len(tokens) < n_tokens or len(meta) < rows
+                or len(vocab) < n_vocab or int(offsets[rows]) != n_tokens):
+            raise ValueError(f"Token cache in {cache_dir} is inconsistent with its manifest; rebuild it.")
+        return cls(vocab[:n_vocab], offsets[:rows + 1], tokens[:n_tokens], meta.iloc[:rows])
+
+    @classmethod
+    def empty(cls) -> "TokenCache":
+        return cls([], np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                   pd.DataFrame(columns=META_COLUMNS))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def token_to_id(self) -> Dict[str, int]:
+        if self._token_to_id is None:
+            self._token_to_id = {tok: i for i, tok in enumerate(self.vocab)}
+        return self._token_to_id
+
+    def doc(self, i: int) -> np.ndarray:
+        """Token ids of review i (a view into the mapped array, no copy)."""
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    def encode(self, text) -> np.ndarray:
+        """Tokenize new text (e.g. a query) with the cached vocabulary; unknown tokens are dropped."""
+        lookup = self.token_to_id
+        return np.array([lookup[t] for t in tokenize(text) if t in lookup], dtype=np.int32)
+
+    def count_matrix(self, start: int = 0, stop: Optional[int] = None,
+                     n_features: Optional[int] = None) -> sparse.csr_matrix:
+        """
+        Bag-of-words counts for reviews [start, stop) as a CSR matrix.
+
+        Built straight from the offsets/tokens arrays; only the (small)
+        per-chunk result is materialized.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        lo, hi = int(self.offsets[start]), int(self.offsets[stop])
+        indptr = np.asarray(self.offsets[start:stop + 1]) - lo
+        indices = np.array(self.tokens[lo:hi], dtype=np.int32)
+        data = np.ones(hi - lo, dtype=np.float32)
+        mat = sparse.csr_matrix(
+            (data, indices, indptr),
+            shape=(stop - start, n_features or len(self.vocab)),
+        )
+        mat.sum_duplicates()
+        return mat
+
+
+def _write_npy_atomic(path: str, arr: np.ndarray) -> None:
+    tmp = path + ".tmp.npy"
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+
+def _write_text_atomic(path: str, text: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    os.replace(tmp, path)
+
+
+def build_token_cache(df: pd.DataFrame, cache_dir: str = DATA_PATHS["token_cache_dir"]) -> TokenCache:
+    """
+    Tokenize reviews not yet in the cache and append them.
+
+    The vocabulary is persistent: existing ids never change, new tokens get
+    the next free id.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        cache = TokenCache.load(cache_dir, mmap=False)
+    except FileNotFoundError:
+        cache = TokenCache.empty()
+    except ValueError as e:
+        print(f"[WARN] {e} Starting a new token cache.")
+        cache = TokenCache.empty()
+
+    keys = review_keys(df)
+    new_mask = ~keys.isin(set(cache.meta["key"])) & ~keys.duplicated()
+    new_df = df[new_mask.values]
+    if new_df.empty:
+        print(f"[INFO] Token cache up to date ({len(cache)} reviews).")
+        return TokenCache.load(cache_dir)
+
+    vocab = list(cache.vocab)
+    lookup = dict(cache.token_to_id)
+    lengths = np.empty(len(new_df), dtype=np.int64)
+    new_ids: List[int] = []
+    for i, text in enumerate(new_df["review_text"]):
+        toks = tokenize(text)
+        for tok in toks:
+            tid = lookup.get(tok)
+            if tid is None:
+                tid = lookup[tok] = len(vocab)
+                vocab.append(tok)
+            new_ids.append(tid)
+        lengths[i] = len(toks)
+
+    offsets = np.concatenate([cache.offsets, cache.offsets[-1] + np.cumsum(lengths)]).astype(np.int64)
+    tokens = np.concatenate([cache.tokens, np.asarray(new_ids, dtype=np.int32)])
+
+    meta_new = pd.DataFrame({"key": keys[new_mask].values})
+    for col in META_COLUMNS[1:]:
+        meta_new[col] = new_df[col].values if col in new_df.columns else None
+    meta = pd.concat([cache.meta, meta_new], ignore_index=True)
+
+    _write_npy_atomic(os.path.join(cache_dir, "tokens.npy"), tokens)
+    _write_npy_atomic(os.path.join(cache_dir, "offsets.npy"), offsets)
+    _write_text_atomic(os.path.join(cache_dir, "vocab.txt"), "".join(tok + "\n" for tok in vocab))
+    _write_text_atomic(os.path.join(cache_dir, "meta.csv"), meta.to_csv(index=False))
+    # last: makes the new rows visible to readers
+    _write_text_atomic(os.path.join(cache_dir, "manifest.json"), json.dumps({
+        "format": CACHE_FORMAT, "rows": len(meta), "tokens": len(tokens), "vocab": len(vocab),
+    }))
+
+    print(f"[INFO] Token cache: +{len(new_df)} reviews ({len(meta)} total, "
+          f"{len(vocab)} vocab) → {cache_dir}")
+    return TokenCache.load(cache_dir)
+
+
 def main():
     df = pd.read_csv(DATA_PATHS["raw_reviews"])
 
-    # Remove missing critical fields
-    df = df.dropna(subset=["review_text", "rating"])
+    # Validate first: missing fields, bad ratings/dates, unknown banks are
+    # quarantined before any other work is done on them
+    df, rejected = validate_reviews(df, known_banks=BANK_NAMES.keys())
+    write_quarantine(rejected, stage="preprocessing")
 
     # Clean text
     df["review_text"] = df["review_text"].apply(clean_text)
 
     # Date formatting
-    df["review_date"] = pd.to_datetime(df["review_date"], errors="coerce")
     df["review_year"] = df["review_date"].dt.year
     df["review_month"] = df["review_date"].dt.month
 
     # Text length
     df["text_length"] = df["review_text"].str.len()
 
-    # Remove invalid ratings
-    df = df[df["rating"].between(1, 5)]
-
     os.makedirs(os.path.dirname(DATA_PATHS["raw_reviews"]), exist_ok=True)
     df.to_csv("data/processed/reviews_processed.csv", index=False)
 
     print("Preprocessing complete. Saved to data/processed/reviews_processed.csv")
     print(df.head())
 
+    # Tokenize once for all downstream NLP stages
+    try:
+        n_cached = len(TokenCache.load())
+    except (FileNotFoundError, ValueError):
+        n_cached = 0
+    cache = build_token_cache(df)
+
+    # Per bank × day sketches, merged in for the reviews that just entered the
+    # cache, so a scrape overlapping earlier ones never counts a review twice
+    # (imported here: sketches.py imports this module)
+    from sketches import record_batch
+    keys = review_keys(df)
+    new = keys.isin(set(cache.meta["key"].iloc[n_cached:])) & ~keys.duplicated()
+    record_batch(df[new.values], source="processed", cache=cache)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,343 @@
+"""
+similar_reviews.py
+"Find similar complaints": nearest-neighbour search over review embeddings.
+
+Offline stage (build):
+- Bag-of-words counts come straight from the shared token cache
+  (preprocessing.build_token_cache), so nothing is re-tokenized.
+- TF-IDF + TruncatedSVD (LSA) turn them into dense float32 vectors, L2
+  normalized and written to memory-mapped .npy segments.
+- An IVF index clusters the vectors with MiniBatchKMeans; each review is
+  stored in the posting list of its nearest centroid.
+
+Query: embed the pasted text with the same model, score the centroids, then
+scan only the `nprobe` closest posting lists with one batched dot product.
+Bank and date filters are applied to the candidate ids before scoring.
+
+Only the reviews of the given CSV are indexed (the token cache may hold
+more), each once, with its text and metadata stored alongside.
+
+New reviews are added incrementally (add): they are embedded with the
+existing model, assigned to the nearest centroid and written as a new vector
+segment. Rebuild now and then so the TF-IDF/SVD model and the centroids pick
+up new vocabulary.
+
+Usage:
+    python src/similar_reviews.py build
+    python src/similar_reviews.py add
+    python src/similar_reviews.py query "app crashes when I transfer" --bank CBE --k 10
+"""
+
+import argparse
+import glob
+import os
+from typing import List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfTransformer
+
+from config import DATA_PATHS, SIMILARITY_CONFIG
+from preprocessing import TokenCache, build_token_cache, review_keys
+
+
+META_COLUMNS = ["key", "review_id", "bank_code", "review_date", "review_text"]
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (mat / norms).astype(np.float32)
+
+
+def _row_counts(cache: TokenCache, rows: np.ndarray) -> sparse.csr_matrix:
+    """Bag-of-words counts for the given cache rows (any order, not contiguous)."""
+    starts = np.asarray(cache.offsets[rows], dtype=np.int64)
+    lengths = np.asarray(cache.offsets[rows + 1], dtype=np.int64) - starts
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+    mat = sparse.csr_matrix(
+        (np.ones(len(positions), dtype=np.float32), np.asarray(cache.tokens[positions]), indptr),
+        shape=(len(rows), len(cache.vocab)),
+    )
+    mat.sum_duplicates()
+    return mat
+
+
+def _to_days(dates) -> np.ndarray:
+    """Dates as int64 days since epoch; missing dates sort before everything."""
+    parsed = pd.to_datetime(pd.Series(dates), errors="coerce", format="mixed")
+    days = parsed.values.astype("datetime64[D]").astype(np.int64)
+    days[parsed.isna().values] = np.iinfo(np.int64).min
+    return days
+
+
+class SimilarityIndex:
+    def __init__(self, index_dir: str, model: dict, centroids: np.ndarray,
+                 segments: List[np.ndarray], assignments: np.ndarray,
+                 meta: pd.DataFrame, cache: TokenCache) -> None:
+        self.index_dir = index_dir
+        self.model = model
+        self.centroids = centroids
+        self.segments = segments
+        self.assignments = assignments
+        self.meta = meta
+        self.cache = cache
+        self._refresh()
+
+    # ---------- internal state ----------
+
+    def _refresh(self) -> None:
+        """Rebuild posting lists, segment offsets and filter columns."""
+        self.seg_starts = np.cumsum([0] + [len(s) for s in self.segments])
+        self.list_order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._bank = self.meta["bank_code"].astype(str).to_numpy()
+        self._days = _to_days(self.meta["review_date"])
+
+    def __len__(self) -> int:
+        return int(self.seg_starts[-1])
+
+    def _posting_list(self, list_id: int) -> np.ndarray:
+        return self.list_order[self.list_offsets[list_id]:self.list_offsets[list_id + 1]]
+
+    def _gather(self, ids: np.ndarray) -> np.ndarray:
+        """Vectors for global row ids (only these rows are read from disk)."""
+        out = np.empty((len(ids), self.centroids.shape[1]), dtype=np.float32)
+        seg_of = np.searchsorted(self.seg_starts, ids, side="right") - 1
+        for seg in np.unique(seg_of):
+            mask = seg_of == seg
+            out[mask] = self.segments[seg][ids[mask] - self.seg_starts[seg]]
+        return out
+
+    # ---------- embedding ----------
+
+    def _embed_counts(self, counts: sparse.csr_matrix) -> np.ndarray:
+        counts = counts[:, :self.model["n_features"]]  # tokens newer than the model are ignored
+        tfidf = self.model["tfidf"].transform(counts)
+        return _normalize(self.model["svd"].transform(tfidf))
+
+    def embed_text(self, text: str) -> np.ndarray:
+        ids = self.cache.encode(text)
+        ids = ids[ids < self.model["n_features"]]
+        counts = sparse.csr_matrix(
+            (np.ones(len(ids), dtype=np.float32), ids, [0, len(ids)]),
+            shape=(1, self.model["n_features"]),
+        )
+        counts.sum_duplicates()
+        return self._embed_counts(counts)[0]
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _write_segment(self, rows: np.ndarray) -> None:
+        """Embed the given cache rows into a new vector segment."""
+        seg_no = len(self.segments)
+        dim = self.centroids.shape[1]
+        vec_path = os.path.join(self.index_dir, f"vectors-{seg_no:05d}.npy")
+        vectors = np.lib.format.open_memmap(vec_path, mode="w+", dtype=np.float32,
+                                            shape=(len(rows), dim))
+        assign = np.empty(len(rows), dtype=np.int32)
+
+        chunk = SIMILARITY_CONFIG["chunk_size"]
+        for lo in range(0, len(rows), chunk):
+            hi = min(lo + chunk, len(rows))
+            block = self._embed_counts(_row_counts(self.cache, rows[lo:hi]))
+            vectors[lo:hi] = block
+            assign[lo:hi] = self._assign(block)
+        vectors.flush()
+        del vectors
+
+        np.save(os.path.join(self.index_dir, f"assign-{seg_no:05d}.npy"), assign)
+        self.segments.append(np.load(vec_path, mmap_mode="r"))
+        self.assignments = np.concatenate([self.assignments, assign])
+
+    # ---------- build / load / add ----------
+
+    @staticmethod
+    def _select(cache: TokenCache, df: pd.DataFrame, skip_keys=()) -> Tuple[np.ndarray, pd.DataFrame]:
+        """
+        Cache rows and index metadata for the reviews of df, one per key,
+        leaving out keys in `skip_keys` (already indexed).
+        """
+        meta = df.assign(key=review_keys(df).values)
+        meta = meta[~meta["key"].duplicated() & ~meta["key"].isin(set(skip_keys))]
+        meta = meta.reindex(columns=META_COLUMNS).reset_index(drop=True)
+        position = pd.Series(np.arange(len(cache)), index=cache.meta["key"].astype(str))
+        position = position[~position.index.duplicated()]
+        # build_token_cache(df) caches every review of df, so none are missing
+        rows = meta["key"].map(position).to_numpy(dtype=np.int64)
+        # inputs without review_id (scripts/preprocess.py) take the cached one
+        meta["review_id"] = meta["review_id"].fillna(
+            pd.Series(cache.meta["review_id"].to_numpy()[rows], dtype=object)
+        )
+        return rows, meta
+
+    @classmethod
+    def build(cls, df: pd.DataFrame,
+              index_dir: str = DATA_PATHS["similarity_index_dir"]) -> "SimilarityIndex":
+        cache = build_token_cache(df)
+        rows, meta = cls._select(cache, df)
+        n = len(rows)
+        if n == 0:
+            raise ValueError("No reviews to index.")
+
+        os.makedirs(index_dir, exist_ok=True)
+        for old in glob.glob(os.path.join(index_dir, "*-*.npy")):
+            os.remove(old)
+
+        # fit on a sample of contiguous blocks
+        rng = np.random.default_rng(0)
+        sample_n = min(n, SIMILARITY_CONFIG["fit_sample"])
+        block = 1000
+        starts = np.arange(0, n, block)
+        if sample_n < n:
+            starts = np.sort(rng.choice(starts, size=max(1, sample_n // block), replace=False))
+        sample = sparse.vstack([_row_counts(cache, rows[s:s + block]) for s in starts]).tocsr()
+
+        n_features = len(cache.vocab)
+        n_components = min(SIMILARITY_CONFIG["n_components"], n_features - 1, sample.shape[0] - 1)
+        tfidf = TfidfTransformer(sublinear_tf=True).fit(sample)
+        svd = TruncatedSVD(n_components=max(1, n_components), random_state=0)
+        svd.fit(tfidf.transform(sample))
+        model = {"tfidf": tfidf, "svd": svd, "n_features": n_features}
+
+        sample_vecs = _normalize(svd.transform(tfidf.transform(sample)))
+        n_lists = SIMILARITY_CONFIG["n_lists"] or int(np.sqrt(n))
+        n_lists = max(1, min(n_lists, len(sample_vecs)))
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, batch_size=4096, n_init=3, random_state=0)
+        kmeans.fit(sample_vecs)
+        centroids = _normalize(kmeans.cluster_centers_)
+
+        joblib.dump(model, os.path.join(index_dir, "model.joblib"))
+        np.save(os.path.join(index_dir, "centroids.npy"), centroids)
+
+        index = cls(index_dir, model, centroids, [], np.zeros(0, dtype=np.int32),
+                    pd.DataFrame(columns=META_COLUMNS), cache)
+        index._write_segment(rows)
+        index.meta = meta
+        index.meta.to_csv(os.path.join(index_dir, "meta.csv"), index=False)
+        index._refresh()
+        print(f"[INFO] Indexed {len(rows)} reviews: {centroids.shape[1]} dims, {n_lists} lists → {index_dir}")
+        return index
+
+    @classmethod
+    def load(cls, index_dir: str = DATA_PATHS["similarity_index_dir"]) -> "SimilarityIndex":
+        model_path = os.path.join(index_dir, "model.joblib")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Similarity index not found in {index_dir}. Run: python src/similar_reviews.py build"
+            )
+        model = joblib.load(model_path)
+        centroids = np.load(os.path.join(index_dir, "centroids.npy"))
+        vec_files = sorted(glob.glob(os.path.join(index_dir, "vectors-*.npy")))
+        segments = [np.load(f, mmap_mode="r") for f in vec_files]
+        assignments = np.concatenate(
+            [np.load(f.replace("vectors-", "assign-")) for f in vec_files]
+        ).astype(np.int32)
+        meta = pd.read_csv(os.path.join(index_dir, "meta.csv"), dtype={"key": str, "review_id": str})
+        return cls(index_dir, model, centroids, segments, assignments, meta, TokenCache.load())
+
+    def add(self, df: pd.DataFrame) -> int:
+        """Index reviews in df that are not indexed yet. Returns how many were added."""
+        self.cache = build_token_cache(df)
+        rows, new_meta = self._select(self.cache, df, skip_keys=self.meta["key"].astype(str))
+        if not len(rows):
+            return 0
+
+        self._write_segment(rows)
+        new_meta.to_csv(os.path.join(self.index_dir, "meta.csv"), mode="a", header=False, index=False)
+        self.meta = pd.concat([self.meta, new_meta], ignore_index=True)
+        self._refresh()
+        print(f"[INFO] Added {len(rows)} reviews ({len(self)} indexed).")
+        return len(rows)
+
+    # ---------- query ----------
+
+    def search(self, text: str, k: int = 10, bank_code: Optional[str] = None,
+               since: Optional[str] = None, until: Optional[str] = None,
+               nprobe: Optional[int] = None) -> pd.DataFrame:
+        """Top-k most similar indexed reviews (cosine similarity)."""
+        columns = ["review_id", "bank_code", "review_date", "score", "review_text"]
+        q = self.embed_text(text)
+        if not q.any():
+            return pd.DataFrame(columns=columns)
+
+        lo = _to_days([since])[0] if since else None
+        hi = _to_days([until])[0] if until else None
+
+        def keep(ids: np.ndarray) -> np.ndarray:
+            mask = np.ones(len(ids), dtype=bool)
+            if bank_code:
+                mask &= self._bank[ids] == bank_code
+            if lo is not None:
+                mask &= self._days[ids] >= lo
+            if hi is not None:
+                mask &= self._days[ids] < hi
+            return ids[mask]
+
+        order = np.argsort(-(self.centroids @ q))
+        nprobe = nprobe or SIMILARITY_CONFIG["nprobe"]
+        probed = 0
+        cand_parts: List[np.ndarray] = []
+        n_cand = 0
+        # widen the probe when filters leave too few candidates
+        while probed < len(order) and (probed < nprobe or n_cand < k):
+            ids = keep(self._posting_list(order[probed]))
+            cand_parts.append(ids)
+            n_cand += len(ids)
+            probed += 1
+
+        if n_cand == 0:
+            return pd.DataFrame(columns=columns)
+        cand = np.sort(np.concatenate(cand_parts))
+        scores = self._gather(cand) @ q
+
+        # one hit per review key (indexes built before keys were unique may
+        # hold a review twice); widen the partial sort until k distinct remain
+        m = min(k, len(scores))
+        while True:
+            top = np.argpartition(-scores, m - 1)[:m]
+            top = top[np.argsort(-scores[top])]
+            hits = self.meta.iloc[cand[top]].assign(score=scores[top])
+            hits = hits[~hits["key"].astype(str).duplicated()]
+            if len(hits) >= k or m == len(scores):
+                break
+            m = min(2 * m, len(scores))
+        return hits.head(k).reset_index(drop=True)[columns]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find similar complaints")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("build", "add"):
+        p = sub.add_parser(name)
+        p.add_argument("--csv", default=DATA_PATHS["processed_reviews"], help="reviews to index")
+    q = sub.add_parser("query")
+    q.add_argument("text")
+    q.add_argument("--k", type=int, default=10)
+    q.add_argument("--bank", help="bank_code filter, e.g. CBE")
+    q.add_argument("--since", help="YYYY-MM-DD")
+    q.add_argument("--until", help="YYYY-MM-DD")
+    q.add_argument("--nprobe", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        SimilarityIndex.build(pd.read_csv(args.csv))
+    elif args.command == "add":
+        SimilarityIndex.load().add(pd.read_csv(args.csv))
+    else:
+        index = SimilarityIndex.load()
+        hits = index.search(args.text, k=args.k, bank_code=args.bank,
+                            since=args.since, until=args.until, nprobe=args.nprobe)
+        with pd.option_context("display.max_colwidth", 120, "display.width", 200):
+            print(hits.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+"""
+sketches.py
+Mergeable sketch summaries per bank × day, so approximate statistics over any
+date range come from a few KB of sketches instead of a scan of the reviews.
+
+Per (bank_code, day) we keep:
+    reviewers    HyperLogLog over user_name            → distinct reviewers
+    text_length  relative-error quantile sketch        → p50 / p90 / p99 ...
+    thumbs_up    relative-error quantile sketch
+    keywords     Count-Min sketch + top-k candidates   → heavy-hitter keywords
+
+Every sketch merges exactly (register max / bucket or counter addition), so
+days, banks and shards are combined at query time in any order. Sketches are
+stored zlib-compressed in SQLite, one row per (source, bank_code, day, metric),
+and every new batch is merged into the stored (bank, day) rows:
+
+    source "processed"  written by src/preprocessing.py for the reviews that
+                        were new to the token cache (keyed by bank + text), so
+                        overlapping scrapes are never counted twice
+    source "db"         written by src/insert_reviews.py for the rows actually
+                        inserted
+
+Keyword tokens come from the shared token cache (preprocessing.py), not from
+re-tokenizing review_text.
+
+Usage:
+    python src/sketches.py query --bank CBE --since 2024-01-01 --until 2024-07-01
+    python src/sketches.py query --source db
+    python src/sketches.py build --csv data/processed/reviews_clean.csv
+        # reset "processed" to exactly the reviews in a full-history CSV
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import struct
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from config import DATA_PATHS, SKETCH_CONFIG
+from preprocessing import TokenCache, review_keys
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sketches (
+    source      TEXT NOT NULL,
+    bank_code   TEXT NOT NULL,
+    day         TEXT NOT NULL,      -- YYYY-MM-DD
+    metric      TEXT NOT NULL,
+    n           INTEGER NOT NULL,   -- values summarized
+    blob        BLOB NOT NULL,
+    PRIMARY KEY (source, bank_code, day, metric)
+);
+"""
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _pack(*arrays: np.ndarray) -> bytes:
+    """1-D arrays as (4-byte dtype, uint64 length, raw data) frames, zlib-compressed."""
+    parts = []
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr).ravel()
+        parts += [arr.dtype.str.encode().ljust(4), struct.pack("<Q", arr.size), arr.tobytes()]
+    return zlib.compress(b"".join(parts))
+
+
+def _unpack(blob: bytes, n: int) -> List[np.ndarray]:
+    raw = zlib.decompress(blob)
+    out, pos = [], 0
+    for _ in range(n):
+        dtype = np.dtype(raw[pos:pos + 4].strip().decode())
+        (size,) = struct.unpack_from("<Q", raw, pos + 4)
+        pos += 12
+        out.append(np.frombuffer(raw, dtype=dtype, count=size, offset=pos).copy())
+        pos += size * dtype.itemsize
+    return out
+
+
+def _hash64(values: pd.Series, key: str = "0123456789123456") -> np.ndarray:
+    """Stable (run-to-run) vectorized 64-bit hash of string values."""
+    return pd.util.hash_pandas_object(values.astype(str), index=False, hash_key=key).to_numpy()
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """Exact bit length of uint64 values (frexp is exact below 2^53, so split in halves)."""
+    hi = np.frexp((x >> np.uint64(32)).astype(np.float64))[1]
+    lo = np.frexp((x & np.uint64(0xFFFFFFFF)).astype(np.float64))[1]
+    return np.where(hi > 0, hi + 32, lo)
+
+
+# --------------------------------------------------------------------
+# Sketches
+# --------------------------------------------------------------------
+
+class HyperLogLog:
+    """Distinct-count sketch; merge is the element-wise max of the registers."""
+
+    def __init__(self, p: int = SKETCH_CONFIG["hll_precision"],
+                 registers: Optional[np.ndarray] = None) -> None:
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8) if registers is None else registers
+
+    def update(self, values: pd.Series) -> "HyperLogLog":
+        h = _hash64(values.dropna())
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = h & np.uint64((1 << (64 - self.p)) - 1)
+        rho = (64 - self.p) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, idx, rho.astype(np.uint8))
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return float(estimate)
+
+    def to_bytes(self) -> bytes:
+        return _pack(self.registers)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "HyperLogLog":
+        (registers,) = _unpack(blob, 1)
+        return cls(int(math.log2(len(registers))), registers)
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch over non-negative values: a histogram with
+    logarithmically sized buckets (value v goes to ceil(log_gamma(v))), so any
+    quantile is within `relative_accuracy` of the true value. Merge adds bucket
+    counts, which makes it exact and order-independent.
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_CONFIG["relative_accuracy"]) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.zero_count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.buckets.values())
+
+    def update(self, values: pd.Series) -> "QuantileSketch":
+        v = pd.to_numeric(values, errors="coerce").dropna().to_numpy(dtype=np.float64)
+        if not len(v):
+            return self
+        self.min = min(self.min, float(v.min()))
+        self.max = max(self.max, float(v.max()))
+        positive = v[v > 0]
+        self.zero_count += len(v) - len(positive)
+        idx = np.ceil(np.log(positive) / math.log(self.gamma)).astype(np.int64)
+        for i, n in zip(*np.unique(idx, return_counts=True)):
+            self.buckets[int(i)] += int(n)
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        for i, n in other.buckets.items():
+            self.buckets[i] += n
+        self.zero_count += other.zero_count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen > rank:
+                value = 2 * self.gamma ** i / (self.gamma + 1)
+                return float(min(max(value, self.min), self.max))
+        return self.max
+
+    def to_bytes(self) -> bytes:
+        keys = np.array(sorted(self.buckets), dtype=np.int32)
+        counts = np.array([self.buckets[k] for k in keys], dtype=np.int64)
+        header = np.array([self.relative_accuracy, self.zero_count, self.min, self.max])
+        return _pack(header, keys, counts)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "QuantileSketch":
+        header, keys, counts = _unpack(blob, 3)
+        sketch = cls(float(header[0]))
+        sketch.zero_count = int(header[1])
+        sketch.min, sketch.max = float(header[2]), float(header[3])
+        sketch.buckets.update(zip(keys.tolist(), counts.tolist()))
+        return sketch
+
+
+class CountMinTopK:
+    """
+    Count-Min sketch for term frequencies plus the current top-k candidates.
+    On merge the tables are added and the candidate sets unioned; the union is
+    re-estimated from the merged table (and cut back to k) only when the top
+    terms are read or the sketch is saved, so merging many days stays cheap.
+    """
+
+    def __init__(self, width: int = SKETCH_CONFIG["cms_width"], depth: int = SKETCH_CONFIG["cms_depth"],
+                 k: int = SKETCH_CONFIG["top_k"]) -> None:
+        self.width, self.depth, self.k = width, depth, k
+        self.table = np.zeros((depth, width), dtype=np.uint32)
+        self.candidates: Dict[str, int] = {}
+        self._pending: set = set()  # merged-in candidates not yet re-estimated
+
+    @staticmethod
+    def _row_key(row: int) -> str:
+        return f"cms-row-{row:08d}"  # hash_pandas_object wants a 16-byte key
+
+    def _cells(self, terms: pd.Series) -> np.ndarray:
+        return np.stack([_hash64(terms, self._row_key(r)) % np.uint64(self.width)
+                         for r in range(self.depth)]).astype(np.int64)
+
+    def estimate(self, terms: Iterable[str]) -> np.ndarray:
+        terms = pd.Series(list(terms), dtype=object)
+        if terms.empty:
+            return np.zeros(0, dtype=np.int64)
+        cells = self._cells(terms)
+        return self.table[np.arange(self.depth)[:, None], cells].min(axis=0).astype(np.int64)
+
+    def _trim(self, terms: Iterable[str] = ()) -> None:
+        terms = list(set(self.candidates) | self._pending | set(terms))
+        self._pending = set()
+        est = self.estimate(terms)
+        top = np.argsort(-est, kind="stable")[:self.k]
+        self.candidates = {terms[i]: int(est[i]) for i in top}
+
+    def update(self, terms: pd.Series) -> "CountMinTopK":
+        if terms.empty:
+            return self
+        counts = terms.value_counts()
+        cells = self._cells(pd.Series(counts.index, dtype=object))
+        for r in range(self.depth):
+            np.add.at(self.table[r], cells[r], counts.to_numpy(dtype=np.uint32))
+        self._trim(counts.index[:self.k])
+        return self
+
+    def merge(self, other: "CountMinTopK") -> "CountMinTopK":
+        self.table += other.table
+        self._pending.update(other.candidates, other._pending)
+        return self
+
+    def top(self, n: int = 10) -> List[Tuple[str, int]]:
+        if self._pending:
+            self._trim()
+        return sorted(self.candidates.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+
+    def to_bytes(self) -> bytes:
+        if self._pending:
+            self._trim()
+        shape = np.array([self.depth, self.width, self.k], dtype=np.int64)
+        terms = np.frombuffer("\n".join(self.candidates).encode("utf-8"), dtype=np.uint8)
+        counts = np.array(list(self.candidates.values()), dtype=np.int64)
+        return _pack(shape, self.table, terms, counts)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "CountMinTopK":
+        shape, table, terms, counts = _unpack(blob, 4)
+        depth, width, k = shape.tolist()
+        sketch = cls(width, depth, k)
+        sketch.table = table.reshape(depth, width)
+        terms = terms.tobytes().decode("utf-8").split("\n") if len(terms) else []
+        sketch.candidates = dict(zip(terms, counts.tolist()))
+        return sketch
+
+
+METRICS = {
+    "reviewers": HyperLogLog,
+    "text_length": QuantileSketch,
+    "thumbs_up": QuantileSketch,
+    "keywords": CountMinTopK,
+}
+
+
+# --------------------------------------------------------------------
+# Building from a batch of reviews
+# --------------------------------------------------------------------
+
+def _cache_rows(cache: TokenCache, df: pd.DataFrame) -> np.ndarray:
+    """Token cache row of every review in df (-1 if it is not cached)."""
+    position = pd.Series(np.arange(len(cache)), index=cache.meta["key"].astype(str))
+    position = position[~position.index.duplicated()]
+    return review_keys(df).map(position).fillna(-1).to_numpy(dtype=np.int64)
+
+
+class _KeywordTokens:
+    """Keyword terms of cached reviews (stop words, short tokens and numbers dropped)."""
+
+    def __init__(self, cache: TokenCache) -> None:
+        self.cache = cache
+        self.vocab = np.array(cache.vocab, dtype=object)
+        self.keep = np.array([
+            len(tok) > 2 and not tok.isdigit() and tok not in ENGLISH_STOP_WORDS
+            for tok in cache.vocab
+        ], dtype=bool)
+
+    def terms(self, rows: np.ndarray) -> pd.Series:
+        docs = [self.cache.doc(i) for i in rows if i >= 0]
+        ids = np.concatenate(docs) if docs else np.zeros(0, dtype=np.int32)
+        return pd.Series(self.vocab[ids[self.keep[ids]]], dtype=object)
+
+
+def build_sketches(df: pd.DataFrame, cache: TokenCache) -> Dict[Tuple[str, str, str], Tuple[int, object]]:
+    """
+    Sketch a batch of validated reviews; keyword tokens are read from `cache`.
+
+    Returns {(bank_code, day, metric): (n, sketch)}. Metrics whose source column
+    is missing from the batch are skipped.
+    """
+    df = df.assign(
+        day=pd.to_datetime(df["review_date"], format="mixed").dt.strftime("%Y-%m-%d"),
+        _cache_row=_cache_rows(cache, df),
+    )
+    if "text_length" not in df.columns:
+        df["text_length"] = df["review_text"].astype(str).str.len()
+
+    uncached = int((df["_cache_row"] < 0).sum())
+    if uncached:
+        print(f"[WARN] {uncached} review(s) not in the token cache; their keywords are not sketched.")
+
+    keywords = _KeywordTokens(cache)
+    sources = {
+        "reviewers": "user_name",
+        "text_length": "text_length",
+        "thumbs_up": "thumbs_up",
+        "keywords": "_cache_row",
+    }
+    out = {}
+    for (bank_code, day), group in df.groupby(["bank_code", "day"], sort=False):
+        for metric, column in sources.items():
+            if column not in group.columns:
+                continue
+            if metric == "keywords":
+                values = keywords.terms(group[column].to_numpy())
+            else:
+                values = group[column]
+            out[(bank_code, day, metric)] = (len(group), METRICS[metric]().update(values))
+    return out
+
+
+# --------------------------------------------------------------------
+# Storage + queries
+# --------------------------------------------------------------------
+
+class SketchStore:
+    def __init__(self, path: str = SKETCH_CONFIG["path"]) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def replace(self, sketches: Dict, source: str) -> None:
+        """Drop everything stored for `source` and write `sketches` (full snapshot)."""
+        with self.db:
+            self.db.execute("DELETE FROM sketches WHERE source = ?;", (source,))
+            self._insert(sketches, source)
+        print(f"[INFO] Sketches: {len(sketches)} bank×day×metric rows written for '{source}'")
+
+    def merge(self, sketches: Dict, source: str) -> None:
+        """Merge `sketches` into what is stored for `source` (incremental loads)."""
+        merged = {}
+        for (bank_code, day, metric), (n, sketch) in sketches.items():
+            row = self.db.execute(
+                "SELECT n, blob FROM sketches WHERE source = ? AND bank_code = ? AND day = ? AND metric = ?;",
+                (source, bank_code, day, metric),
+            ).fetchone()
+            if row:
+                sketch = METRICS[metric].from_bytes(row[1]).merge(sketch)
+                n += row[0]
+            merged[(bank_code, day, metric)] = (n, sketch)
+        with self.db:
+            self._insert(merged, source)
+        print(f"[INFO] Sketches: {len(merged)} bank×day×metric rows merged into '{source}'")
+
+    def _insert(self, sketches: Dict, source: str) -> None:
+        self.db.executemany(
+            """
+            INSERT OR REPLACE INTO sketches (source, bank_code, day, metric, n, blob)
+            VALUES (?, ?, ?, ?, ?, ?);
+            """,
+            [(source, bank, day, metric, int(n), sketch.to_bytes())
+             for (bank, day, metric), (n, sketch) in sketches.items()],
+        )
+
+    def load(self, metric: str, source: str = "processed", banks: Optional[Iterable[str]] = None,
+             since: Optional[str] = None, until: Optional[str] = None) -> Tuple[int, Optional[object]]:
+        """Merged sketch of `metric` over the banks and [since, until) range, and the review count."""
+        sql = "SELECT n, blob FROM sketches WHERE source = ? AND metric = ?"
+        params: List = [source, metric]
+        if banks:
+            banks = list(banks)
+            sql += f" AND bank_code IN ({', '.join('?' * len(banks))})"
+            params += banks
+        if since:
+            sql += " AND day >= ?"
+            params.append(since)
+        if until:
+            sql += " AND day < ?"
+            params.append(until)
+
+        total, merged = 0, None
+        for n, blob in self.db.execute(sql + ";", params):
+            sketch = METRICS[metric].from_bytes(blob)
+            merged = sketch if merged is None else merged.merge(sketch)
+            total += n
+        return total, merged
+
+    def summary(self, source: str = "processed", banks: Optional[Iterable[str]] = None,
+                since: Optional[str] = None, until: Optional[str] = None, top_n: int = 10) -> Dict:
+        out: Dict = {"source": source, "banks": list(banks) if banks else "all",
+                     "since": since, "until": until}
+
+        n, hll = self.load("reviewers", source, banks, since, until)
+        out["reviews"] = n
+        out["distinct_reviewers"] = round(hll.count()) if hll else None
+
+        for metric in ("text_length", "thumbs_up"):
+            _, qs = self.load(metric, source, banks, since, until)
+            out[metric] = {f"p{round(q * 100)}": qs.quantile(q) for q in QUANTILES} if qs else None
+
+        _, cms = self.load("keywords", source, banks, since, until)
+        out["top_keywords"] = cms.top(top_n) if cms else []
+        return out
+
+
+def record_batch(df: pd.DataFrame, source: str, cache: Optional[TokenCache] = None,
+                 replace: bool = False) -> None:
+    """
+    Sketch a batch and merge it into the store. Callers pass only reviews not
+    sketched before; replace=True instead resets `source` to just this batch.
+    """
+    if df.empty:
+        return
+    if cache is None:
+        try:
+            cache = TokenCache.load()
+        except FileNotFoundError:
+            cache = TokenCache.empty()
+
+    store = SketchStore()
+    try:
+        sketches = build_sketches(df, cache)
+        if replace:
+            store.replace(sketches, source)
+        else:
+            store.merge(sketches, source)
+    finally:
+        store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-bank × day sketch summaries")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="reset the 'processed' sketches to the reviews in a CSV")
+    build.add_argument("--csv", default=DATA_PATHS["processed_reviews"],
+                       help="CSV holding the full review history")
+
+    query = sub.add_parser("query", help="approximate statistics for a bank / date range")
+    query.add_argument("--bank", nargs="+", help="bank codes (default: all)")
+    query.add_argument("--since", help="first day, YYYY-MM-DD")
+    query.add_argument("--until", help="day after the last one, YYYY-MM-DD")
+    query.add_argument("--source", choices=["processed", "db"], default="processed")
+    query.add_argument("--top", type=int, default=10, help="heavy-hitter keywords to show")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        record_batch(pd.read_csv(args.csv), "processed", replace=True)
+        return
+
+    store = SketchStore()
+    try:
+        print(json.dumps(store.summary(args.source, args.bank, args.since, args.until, args.top), indent=2))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
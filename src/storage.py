@@ -0,0 +1,347 @@
+"""
+storage.py
+Storage backends for the review analytics data.
+
+Every backend exposes the same three operations:
+    create()  – set up tables / views
+    load()    – bring the processed datasets into the backend
+    query()   – run one of the named INSIGHT_QUERIES, returning a list of dicts
+
+Backends:
+    postgres – production backend (create_tables.py + insert_* loaders)
+    duckdb   – embedded columnar engine. Views are defined directly over the
+               processed CSVs (or their Parquet snapshot after load()), so no
+               server is needed and aggregations run vectorized. Connections
+               are in-memory and hold no file lock, so `load` can run while the
+               API is serving; loads are recorded in columnar/data_loads.csv,
+               which readers watch to pick up a new snapshot.
+
+Usage:
+    python src/storage.py --backend duckdb create
+    python src/storage.py --backend duckdb load
+    python src/storage.py --backend duckdb query rating_distribution --bank CBE
+"""
+
+import argparse
+import csv
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import DATA_PATHS, STORAGE_CONFIG
+from insight_queries import INSIGHT_QUERIES
+
+
+class StorageBackend(ABC):
+    """Base class; subclasses implement create/load/query."""
+
+    name = "base"
+
+    @abstractmethod
+    def create(self) -> None:
+        ...
+
+    @abstractmethod
+    def load(self) -> None:
+        ...
+
+    @abstractmethod
+    def query(self, name: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+# --------------------------------------------------------------------
+# PostgreSQL
+# --------------------------------------------------------------------
+
+class PostgresBackend(StorageBackend):
+    name = "postgres"
+
+    def create(self) -> None:
+        from create_tables import create_tables
+        create_tables()
+
+    def load(self) -> None:
+        from insert_banks import insert_banks
+        from insert_keywords import insert_keywords
+        from insert_reviews import insert_reviews
+
+        insert_banks()
+        insert_reviews()
+        insert_keywords()
+
+    def query(self, name: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        from db_connection import pooled_connection
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(INSIGHT_QUERIES[name], params or {})
+                cols = [c[0] for c in cur.description]
+                return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def close(self) -> None:
+        from db_connection import close_pool
+        close_pool()
+
+
+# --------------------------------------------------------------------
+# DuckDB (embedded columnar)
+# --------------------------------------------------------------------
+
+# columns the insight queries expect on the reviews view
+REVIEW_COLUMNS = [
+    "review_id", "review_text", "rating", "review_date", "thumbs_up",
+    "user_name", "reply", "app_version", "sentiment", "text_length",
+    "themes", "scraped_at",
+]
+
+_PG_PARAM = re.compile(r"%\((\w+)\)s")
+
+
+class DuckDBBackend(StorageBackend):
+    """
+    Embedded backend on DuckDB.
+
+    `banks`, `reviews`, `bank_keywords` and `data_loads` are views with the
+    same columns as the PostgreSQL tables, so INSIGHT_QUERIES run unchanged
+    (only the %(name)s placeholders are rewritten to DuckDB's $name).
+    """
+
+    name = "duckdb"
+
+    def __init__(self) -> None:
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError(
+                "The duckdb backend needs the 'duckdb' package: pip install duckdb"
+            ) from e
+
+        self.con = duckdb.connect()  # in-memory: the data lives in the CSV/Parquet files
+        self._lock = threading.Lock()
+        self._views_ready = False
+        self._views_version: Optional[Tuple[int, int]] = None
+
+    # ---------- sources ----------
+
+    @staticmethod
+    def _scan(path: str) -> str:
+        path = path.replace("'", "''")
+        if path.endswith(".parquet"):
+            return f"read_parquet('{path}')"
+        return f"read_csv_auto('{path}', header=true)"
+
+    @staticmethod
+    def _parquet_path(name: str) -> str:
+        return os.path.join(DATA_PATHS["columnar_dir"], f"{name}.parquet")
+
+    @staticmethod
+    def _loads_path() -> str:
+        return os.path.join(DATA_PATHS["columnar_dir"], "data_loads.csv")
+
+    def _loads_version(self) -> Optional[Tuple[int, int]]:
+        """(mtime, size) of the load marker; it only ever grows, one row per load."""
+        try:
+            st = os.stat(self._loads_path())
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _ensure_views(self) -> None:
+        """(Re)define the views on first use and after every load."""
+        with self._lock:
+            version = self._loads_version()
+            if not self._views_ready or version != self._views_version:
+                self.create()
+                self._views_ready, self._views_version = True, version
+
+    def _source(self, name: str, csv_path: str) -> Optional[str]:
+        """Prefer the Parquet snapshot written by load(), else read the CSV in place."""
+        parquet = self._parquet_path(name)
+        if os.path.exists(parquet):
+            return self._scan(parquet)
+        if os.path.exists(csv_path):
+            return self._scan(csv_path)
+        return None
+
+    def _columns(self, source: str) -> List[str]:
+        return [row[0] for row in self.con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+
+    # ---------- interface ----------
+
+    def create(self) -> None:
+        reviews_src = self._source("reviews", DATA_PATHS["sentiment_reviews"])
+        if reviews_src is None:
+            raise FileNotFoundError(
+                f"Sentiment dataset not found at {DATA_PATHS['sentiment_reviews']}. "
+                f"Run Task 2 to generate reviews_with_sentiment.csv."
+            )
+        app_info_src = self._source("app_info", DATA_PATHS["app_info"])
+        keywords_src = self._source("keywords", DATA_PATHS["keywords"])
+
+        review_cols = set(self._columns(reviews_src))
+
+        # banks: app_info.csv if scraped, otherwise the distinct banks in the reviews
+        if app_info_src is not None:
+            banks_from = f"SELECT DISTINCT bank_code, bank_name, app_id FROM {app_info_src}"
+        else:
+            banks_from = f"SELECT DISTINCT bank_code, bank_name, NULL AS app_id FROM {reviews_src}"
+        self.con.execute(f"""
+            CREATE OR REPLACE VIEW banks AS
+            SELECT CAST(ROW_NUMBER() OVER (ORDER BY bank_code) AS INTEGER) AS bank_id,
+                   bank_code, bank_name, app_id
+            FROM ({banks_from});
+        """)
+
+        # reviews: same columns as the PostgreSQL table, NULL where the CSV lacks them
+        aliases = {"sentiment": "sentiment_label", "reply": "reply_content"}
+        select = []
+        for col in REVIEW_COLUMNS:
+            if col in review_cols:
+                select.append(f"r.{col}")
+            elif aliases.get(col) in review_cols:
+                select.append(f"r.{aliases[col]} AS {col}")
+            else:
+                select.append(f"NULL AS {col}")
+        self.con.execute(f"""
+            CREATE OR REPLACE VIEW reviews AS
+            SELECT {", ".join(select)}, b.bank_id
+            FROM {reviews_src} r
+            JOIN banks b ON b.bank_code = r.bank_code;
+        """)
+
+        if keywords_src is not None:
+            kw_cols = set(self._columns(keywords_src))
+            join_col = "bank_code" if "bank_code" in kw_cols else "bank_name"
+            score = "k.score" if "score" in kw_cols else "NULL"
+            self.con.execute(f"""
+                CREATE OR REPLACE VIEW bank_keywords AS
+                SELECT b.bank_id, k.keyword, k.rank, {score} AS score
+                FROM {keywords_src} k
+                JOIN banks b ON b.{join_col} = k.{join_col};
+            """)
+        else:
+            self.con.execute("""
+                CREATE OR REPLACE VIEW bank_keywords AS
+                SELECT NULL::INTEGER AS bank_id, NULL::VARCHAR AS keyword,
+                       NULL::INTEGER AS rank, NULL::DOUBLE AS score
+                WHERE FALSE;
+            """)
+
+        if os.path.exists(self._loads_path()):
+            loads = self._loads_path().replace("'", "''")
+            self.con.execute(f"""
+                CREATE OR REPLACE VIEW data_loads AS
+                SELECT * FROM read_csv('{loads}', header=true,
+                    columns={{'load_id': 'INTEGER', 'table_name': 'VARCHAR',
+                              'row_count': 'INTEGER', 'loaded_at': 'TIMESTAMP'}});
+            """)
+        else:
+            self.con.execute("""
+                CREATE OR REPLACE VIEW data_loads AS
+                SELECT NULL::INTEGER AS load_id, NULL::VARCHAR AS table_name,
+                       NULL::INTEGER AS row_count, NULL::TIMESTAMP AS loaded_at
+                WHERE FALSE;
+            """)
+        print("✅ DuckDB views created")
+
+    def load(self) -> None:
+        """Snapshot the processed CSVs to Parquet and point the views at it."""
+        os.makedirs(DATA_PATHS["columnar_dir"], exist_ok=True)
+        sources = {
+            "reviews": DATA_PATHS["sentiment_reviews"],
+            "app_info": DATA_PATHS["app_info"],
+            "keywords": DATA_PATHS["keywords"],
+        }
+        for name, csv_path in sources.items():
+            if not os.path.exists(csv_path):
+                continue
+            # write next to the target and swap it in, so readers never see a partial file
+            final = self._parquet_path(name)
+            tmp = final + ".tmp"
+            out = tmp.replace("'", "''")
+            self.con.execute(f"COPY (SELECT * FROM {self._scan(csv_path)}) TO '{out}' (FORMAT PARQUET);")
+            os.replace(tmp, final)
+
+        self.create()
+        row_count = self.con.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+        load_id = (self.con.execute("SELECT COALESCE(MAX(load_id), 0) FROM data_loads").fetchone()[0]) + 1
+
+        # appending to the marker file is what tells running readers to reload
+        path = self._loads_path()
+        is_new = not os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            if is_new:
+                writer.writerow(["load_id", "table_name", "row_count", "loaded_at"])
+            writer.writerow([load_id, "reviews", row_count, datetime.now().isoformat(sep=" ")])
+        print(f"✅ Loaded {row_count} reviews into {DATA_PATHS['columnar_dir']}")
+
+    def query(self, name: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        sql = INSIGHT_QUERIES[name]
+        # DuckDB rejects named parameters the statement does not use
+        used = set(_PG_PARAM.findall(sql))
+        params = {k: v for k, v in (params or {}).items() if k in used}
+        sql = _PG_PARAM.sub(r"$\1", sql)
+        self._ensure_views()
+        # one cursor per call so the backend can be shared between threads
+        cur = self.con.cursor()
+        try:
+            cur.execute(sql, params)
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+    def close(self) -> None:
+        self.con.close()
+
+
+BACKENDS = {
+    PostgresBackend.name: PostgresBackend,
+    DuckDBBackend.name: DuckDBBackend,
+}
+
+
+def get_backend(name: Optional[str] = None) -> StorageBackend:
+    """Instantiate the configured backend (STORAGE_BACKEND, default postgres)."""
+    name = name or STORAGE_CONFIG["backend"]
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}'. Choose from: {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create, load or query a storage backend")
+    parser.add_argument("--backend", default=STORAGE_CONFIG["backend"], choices=sorted(BACKENDS))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("create")
+    sub.add_parser("load")
+    q = sub.add_parser("query")
+    q.add_argument("name", choices=sorted(INSIGHT_QUERIES))
+    q.add_argument("--bank", help="bank_code, e.g. CBE")
+    q.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+    try:
+        if args.command == "create":
+            backend.create()
+        elif args.command == "load":
+            backend.load()
+        else:
+            rows = backend.query(args.name, {"bank_code": args.bank, "limit": args.limit})
+            for row in rows:
+                print(row)
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
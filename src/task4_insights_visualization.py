@@ -4,20 +4,49 @@ Task 4 – Insights and Recommendations (Code Side)
 
 This script:
 - Loads enriched review data from Task 2 (reviews_with_sentiment.csv)
-  and keyword data (keywords_per_bank.csv).
+  and keyword data (keywords_per_bank.csv), or streams them straight from
+  the PostgreSQL `reviews` / `bank_keywords` tables with --source db.
 - Computes:
     * Rating distributions per bank
     * Sentiment distributions per bank
     * Theme frequencies per bank
     * Top keywords per bank (from TF-IDF)
+    * Discovered complaint topics per bank, when src/topic_discovery.py has
+      been run (all-time counts; --since/--until do not apply)
 - Generates 3–5 Matplotlib plots and saves them under `figures/`.
 
+Rendering:
+- The per-bank aggregates are computed once in the main process; figures are
+  then drawn in a process pool with the non-interactive Agg backend.
+- A hash of each figure's aggregate is kept in figures/.render_manifest.json;
+  figures whose input did not change since the last run are skipped
+  (use --force to redraw everything).
+- Banks are laid out as a grid of small multiples, at most BANKS_PER_PAGE
+  per image. Extra pages are saved as <name>_page2.png, <name>_page3.png, ...
+
+With --source db, reviews are read through a named server-side cursor in
+chunks of --chunk-size rows. Only the columns the plots need are selected,
+bank/date filters run in the database, and each chunk is folded into the
+aggregates before the next one is fetched, so memory stays bounded no matter
+how large the table is.
+
 Usage (from project root):
-    python src/task4_insights_visualization.py
+    python src/task4_insights_visualization.py [--force] [--workers N]
+    python src/task4_insights_visualization.py --source db [--banks CBE BOA]
+        [--since 2024-01-01] [--until 2025-01-01] [--chunk-size 50000]
 """
 
+import argparse
+import hashlib
+import json
+import math
 import os
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import matplotlib
+
+matplotlib.use("Agg")  # headless; also required inside worker processes
 
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -26,6 +55,17 @@ from config import DATA_PATHS
 
 
 FIG_DIR = "figures"
+MANIFEST_NAME = ".render_manifest.json"
+
+CHUNK_SIZE = 50_000
+
+DPI = 200
+GRID_DPI = 120  # multi-row small-multiple pages: many panels, lower resolution is fine
+GRID_COLS = 4
+BANKS_PER_PAGE = 12
+
+# bump when drawing code changes so cached figures are redrawn
+RENDER_VERSION = 1
 
 
 # --------------------------------------------------------------------
@@ -37,6 +77,17 @@ def ensure_fig_dir(path: str = FIG_DIR) -> None:
     os.makedirs(path, exist_ok=True)
 
 
+def load_topic_counts(banks: Optional[Iterable[str]] = None) -> Optional[pd.DataFrame]:
+    """Per-bank cluster counts from topic_discovery.py, or None if it has not been run."""
+    path = os.path.join(DATA_PATHS["topics_dir"], "clusters_per_bank.csv")
+    if not os.path.exists(path):
+        return None
+    topics = pd.read_csv(path)
+    if banks:
+        topics = topics[topics["bank_code"].isin(banks)]
+    return topics[["bank_name", "label", "count"]].reset_index(drop=True)
+
+
 def load_datasets() -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Load reviews_with_sentiment.csv and keywords_per_bank.csv.
@@ -45,8 +96,7 @@ def load_datasets() -> Tuple[pd.DataFrame, pd.DataFrame]:
         reviews_df, keywords_df
     """
     sentiment_path = DATA_PATHS.get("sentiment_reviews")
-    processed_dir = DATA_PATHS["processed_dir"]
-    keywords_path = os.path.join(processed_dir, "keywords_per_bank.csv")
+    keywords_path = DATA_PATHS["keywords"]
 
     if not sentiment_path or not os.path.exists(sentiment_path):
         raise FileNotFoundError(
@@ -76,166 +126,409 @@ def load_datasets() -> Tuple[pd.DataFrame, pd.DataFrame]:
 
 
 # --------------------------------------------------------------------
-# Plot functions
+# Aggregates (one small tidy frame per figure, always with bank_name)
 # --------------------------------------------------------------------
 
-def plot_rating_distribution(df: pd.DataFrame) -> None:
-    """Plot rating distribution per bank."""
-    ensure_fig_dir()
-
-    pivot = (
-        df.groupby(["bank_name", "rating"])["review_id"]
-        .count()
+def rating_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """Number of reviews per (bank, rating)."""
+    return (
+        df.groupby(["bank_name", "rating"])
+        .size()
         .reset_index(name="count")
     )
 
-    banks = pivot["bank_name"].unique()
-    ratings = sorted(df["rating"].dropna().unique())
 
-    # create one subplot per bank
-    n_banks = len(banks)
-    fig, axes = plt.subplots(1, n_banks, figsize=(5 * n_banks, 4), sharey=True)
-
-    if n_banks == 1:
-        axes = [axes]  # make iterable
-
-    for ax, bank in zip(axes, banks):
-        sub = pivot[pivot["bank_name"] == bank]
-        counts = [sub[sub["rating"] == r]["count"].sum() for r in ratings]
-
-        ax.bar(ratings, counts)
-        ax.set_title(bank)
-        ax.set_xlabel("Rating (1–5)")
-        ax.set_ylabel("Number of Reviews")
-        ax.set_xticks(ratings)
-
-    fig.suptitle("Rating Distribution per Bank")
-    fig.tight_layout()
-    out_path = os.path.join(FIG_DIR, "rating_distribution_per_bank.png")
-    plt.savefig(out_path, dpi=200)
-    plt.close(fig)
-    print(f"[INFO] Saved: {out_path}")
+def sentiment_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """Number of reviews per (bank, POSITIVE/NEGATIVE)."""
+    labels = df["sentiment_label"].str.upper()
+    return (
+        df.assign(sentiment_label=labels)
+        .groupby(["bank_name", "sentiment_label"])
+        .size()
+        .reset_index(name="count")
+    )
 
 
-def plot_sentiment_distribution(df: pd.DataFrame) -> None:
-    """Plot sentiment (POSITIVE/NEGATIVE) distribution per bank."""
-    ensure_fig_dir()
+def theme_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Number of reviews mentioning each theme per bank.
 
-    # Normalize label casing
-    df["sentiment_label"] = df["sentiment_label"].str.upper()
+    Expects a 'themes' column with comma-separated theme names.
+    """
+    tmp = df[["bank_name", "themes"]].dropna().copy()
+    tmp["themes"] = tmp["themes"].astype(str)
+    tmp["theme"] = tmp["themes"].str.split(",")
+    tmp = tmp.explode("theme")
+    tmp["theme"] = tmp["theme"].str.strip()
+    tmp = tmp[tmp["theme"] != ""]
 
-    pivot = (
-        df.groupby(["bank_name", "sentiment_label"])["review_id"]
+    return (
+        tmp.groupby(["bank_name", "theme"])["theme"]
         .count()
         .reset_index(name="count")
     )
 
-    banks = pivot["bank_name"].unique()
-    labels = ["NEGATIVE", "POSITIVE"]  # enforce order
 
-    n_banks = len(banks)
-    fig, axes = plt.subplots(1, n_banks, figsize=(5 * n_banks, 4), sharey=True)
+AGGREGATES = {
+    "rating": rating_counts,
+    "sentiment": sentiment_counts,
+    "themes": theme_counts,
+}
 
-    if n_banks == 1:
-        axes = [axes]
 
-    for ax, bank in zip(axes, banks):
-        sub = pivot[pivot["bank_name"] == bank]
-        counts = [sub[sub["sentiment_label"] == lab]["count"].sum() for lab in labels]
+def aggregate_reviews(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """All review aggregates for one frame (or one chunk of a larger table)."""
+    out = {}
+    for kind, func in AGGREGATES.items():
+        if kind == "themes" and "themes" not in df.columns:
+            continue
+        out[kind] = func(df)
+    return out
 
-        ax.bar(labels, counts)
-        ax.set_title(bank)
-        ax.set_xlabel("Sentiment")
-        ax.set_ylabel("Number of Reviews")
 
-    fig.suptitle("Sentiment Distribution per Bank")
-    fig.tight_layout()
-    out_path = os.path.join(FIG_DIR, "sentiment_distribution_per_bank.png")
-    plt.savefig(out_path, dpi=200)
-    plt.close(fig)
-    print(f"[INFO] Saved: {out_path}")
+def merge_aggregates(parts: Iterable[Dict[str, pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+    """
+    Fold per-chunk aggregates into one set. Every aggregate is a count, so
+    merging is concat + groupby-sum; only one chunk's partials are held at a time.
+    """
+    merged: Dict[str, pd.DataFrame] = {}
+    for part in parts:
+        for kind, agg in part.items():
+            if kind in merged:
+                keys = [c for c in agg.columns if c != "count"]
+                agg = (
+                    pd.concat([merged[kind], agg], ignore_index=True)
+                    .groupby(keys, sort=False)["count"]
+                    .sum()
+                    .reset_index()
+                )
+            merged[kind] = agg
+    for kind, agg in merged.items():
+        merged[kind] = agg.sort_values([c for c in agg.columns if c != "count"]).reset_index(drop=True)
+    return merged
+
+
+def filter_reviews(df: pd.DataFrame, banks: Optional[List[str]] = None,
+                   since: Optional[str] = None, until: Optional[str] = None) -> pd.DataFrame:
+    """Client-side equivalent of the database filters for the CSV source."""
+    if banks:
+        df = df[df["bank_code"].isin(banks)]
+    if (since or until) and "review_date" in df.columns:
+        dates = pd.to_datetime(df["review_date"], errors="coerce")
+        if since:
+            df = df[dates >= pd.Timestamp(since)]
+            dates = dates[df.index]
+        if until:
+            df = df[dates < pd.Timestamp(until)]
+    return df
+
 
+# --------------------------------------------------------------------
+# PostgreSQL source
+# --------------------------------------------------------------------
 
-def plot_themes_per_bank(df: pd.DataFrame) -> None:
+# columns each aggregate reads (bank_name is always selected)
+DB_COLUMNS = {
+    "rating": ["r.rating"],
+    "sentiment": ["r.sentiment AS sentiment_label"],
+    "themes": ["r.themes"],
+}
+
+
+def _db_filters(banks: Optional[List[str]], since: Optional[str],
+                until: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    clauses, params = [], {}
+    if banks:
+        clauses.append("b.bank_code = ANY(%(banks)s)")
+        params["banks"] = list(banks)
+    if since:
+        clauses.append("r.review_date >= %(since)s")
+        params["since"] = since
+    if until:
+        clauses.append("r.review_date < %(until)s")
+        params["until"] = until
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, params
+
+
+def load_aggregates_from_db(banks: Optional[List[str]] = None, since: Optional[str] = None,
+                            until: Optional[str] = None,
+                            chunk_size: int = CHUNK_SIZE) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
     """
-    Plot top themes per bank (bar chart).
+    Stream the reviews table in bounded chunks and aggregate as we go.
 
-    Expects a 'themes' column with comma-separated theme names.
+    Returns:
+        aggregates (as from aggregate_reviews), keywords_df
+    """
+    from db_connection import stream_query
+
+    where, params = _db_filters(banks, since, until)
+    columns = ["b.bank_name"] + [c for cols in DB_COLUMNS.values() for c in cols]
+    sql = f"""
+        SELECT {", ".join(columns)}
+        FROM reviews r
+        JOIN banks b ON b.bank_id = r.bank_id
+        {where};
     """
-    if "themes" not in df.columns:
-        print("[WARN] 'themes' column not found. Skipping theme plot.")
-        return
 
-    ensure_fig_dir()
+    n_rows = 0
+
+    def chunks():
+        nonlocal n_rows
+        for chunk in stream_query(sql, params, chunk_size=chunk_size, cursor_name="task4_reviews"):
+            n_rows += len(chunk)
+            yield aggregate_reviews(chunk)
+
+    aggregates = merge_aggregates(chunks())
+    if not aggregates:
+        # nothing matched the filters: empty aggregates with the usual columns
+        print("[WARN] No reviews matched the filters.")
+        empty = pd.DataFrame(columns=[c.split(" AS ")[-1].split(".")[-1] for c in columns])
+        aggregates = aggregate_reviews(empty)
+
+    kw_where = "WHERE b.bank_code = ANY(%(banks)s)" if banks else ""
+    kw_sql = f"""
+        SELECT b.bank_name, k.keyword, k.rank
+        FROM bank_keywords k
+        JOIN banks b ON b.bank_id = k.bank_id
+        {kw_where};
+    """
+    kw_parts = list(stream_query(kw_sql, {"banks": list(banks)} if banks else {},
+                                 chunk_size=chunk_size, cursor_name="task4_keywords"))
+    keywords_df = (pd.concat(kw_parts, ignore_index=True) if kw_parts
+                   else pd.DataFrame(columns=["bank_name", "keyword", "rank"]))
 
-    # explode themes into rows
-    tmp = df[["bank_name", "themes"]].dropna().copy()
-    tmp["themes"] = tmp["themes"].astype(str)
-    tmp["theme"] = tmp["themes"].str.split(",")
-    tmp = tmp.explode("theme")
-    tmp["theme"] = tmp["theme"].str.strip()
-    tmp = tmp[tmp["theme"] != ""]
+    print(f"[INFO] Streamed {n_rows} reviews and {len(keywords_df)} keyword rows from PostgreSQL.")
+    return aggregates, keywords_df
 
-    pivot = (
-        tmp.groupby(["bank_name", "theme"])["theme"]
-        .count()
-        .reset_index(name="count")
-    )
 
-    banks = pivot["bank_name"].unique()
-    n_banks = len(banks)
-    fig, axes = plt.subplots(1, n_banks, figsize=(6 * n_banks, 5), sharey=False)
+# --------------------------------------------------------------------
+# Drawing (one subplot per bank)
+# --------------------------------------------------------------------
 
-    if n_banks == 1:
-        axes = [axes]
+def draw_rating(ax, sub: pd.DataFrame, options: Dict[str, Any]) -> None:
+    ratings = options["ratings"]
+    counts = [sub[sub["rating"] == r]["count"].sum() for r in ratings]
+    ax.bar(ratings, counts)
+    ax.set_xlabel("Rating (1–5)")
+    ax.set_ylabel("Number of Reviews")
+    ax.set_xticks(ratings)
 
-    for ax, bank in zip(axes, banks):
-        sub = pivot[pivot["bank_name"] == bank].sort_values("count", ascending=False)
-        sub = sub.head(6)  # top 6 themes
 
-        ax.barh(sub["theme"], sub["count"])
+def draw_sentiment(ax, sub: pd.DataFrame, options: Dict[str, Any]) -> None:
+    labels = ["NEGATIVE", "POSITIVE"]  # enforce order
+    counts = [sub[sub["sentiment_label"] == lab]["count"].sum() for lab in labels]
+    ax.bar(labels, counts)
+    ax.set_xlabel("Sentiment")
+    ax.set_ylabel("Number of Reviews")
+
+
+def draw_themes(ax, sub: pd.DataFrame, options: Dict[str, Any]) -> None:
+    sub = sub.sort_values("count", ascending=False).head(6)  # top 6 themes
+    ax.barh(sub["theme"], sub["count"])
+    ax.set_xlabel("Count")
+    ax.invert_yaxis()  # highest at top
+
+
+def draw_keywords(ax, sub: pd.DataFrame, options: Dict[str, Any]) -> None:
+    top_n = options["top_n"]
+    sub = sub.sort_values("rank").head(top_n)
+    ax.barh(sub["keyword"], top_n - sub["rank"] + 1)  # simple score
+    ax.set_xlabel("Keyword Importance (relative)")
+    ax.invert_yaxis()
+
+
+def draw_topics(ax, sub: pd.DataFrame, options: Dict[str, Any]) -> None:
+    sub = sub.sort_values("count", ascending=False).head(6)  # top 6 clusters
+    ax.barh(sub["label"], sub["count"])
+    ax.set_xlabel("Reviews")
+    ax.invert_yaxis()
+
+
+DRAWERS = {
+    "rating": draw_rating,
+    "sentiment": draw_sentiment,
+    "themes": draw_themes,
+    "keywords": draw_keywords,
+    "topics": draw_topics,
+}
+
+
+class FigureSpec(NamedTuple):
+    name: str               # output file stem under FIG_DIR
+    title: str
+    kind: str               # key into DRAWERS
+    data: pd.DataFrame      # aggregate with a bank_name column
+    options: Dict[str, Any]
+    sharey: bool = False
+    panel_size: Tuple[float, float] = (5, 4)  # inches per bank on single-row figures
+
+    def banks(self) -> List[str]:
+        return list(pd.unique(self.data["bank_name"]))
+
+    def n_pages(self) -> int:
+        return max(1, math.ceil(len(self.banks()) / BANKS_PER_PAGE))
+
+    def out_path(self, page: int, fig_dir: str = FIG_DIR) -> str:
+        suffix = "" if page == 1 else f"_page{page}"
+        return os.path.join(fig_dir, f"{self.name}{suffix}.png")
+
+    def input_hash(self, dpi: int) -> str:
+        h = hashlib.sha256()
+        h.update(self.data.to_csv(index=False).encode("utf-8"))
+        layout = [RENDER_VERSION, self.title, self.kind, self.options, self.sharey,
+                  self.panel_size, dpi, GRID_DPI, GRID_COLS, BANKS_PER_PAGE]
+        h.update(json.dumps(layout, sort_keys=True, default=str).encode("utf-8"))
+        return h.hexdigest()
+
+
+def render_page(spec: FigureSpec, page: int, dpi: int = DPI, fig_dir: str = FIG_DIR) -> str:
+    """Draw one page of a figure (a grid of per-bank subplots) and save it."""
+    banks = spec.banks()
+    page_banks = banks[(page - 1) * BANKS_PER_PAGE: page * BANKS_PER_PAGE]
+
+    n = len(page_banks)
+    ncols = min(n, GRID_COLS)
+    nrows = math.ceil(n / ncols)
+    if nrows > 1:
+        # small multiples: smaller panels, lower dpi
+        panel_w, panel_h, dpi = 4, 3, min(dpi, GRID_DPI)
+    else:
+        panel_w, panel_h = spec.panel_size
+    fig, axes = plt.subplots(
+        nrows, ncols,
+        figsize=(panel_w * ncols, panel_h * nrows),
+        sharey=spec.sharey,
+        squeeze=False,
+    )
+    flat = axes.ravel()
+
+    draw = DRAWERS[spec.kind]
+    by_bank = dict(tuple(spec.data.groupby("bank_name", sort=False)))
+    for ax, bank in zip(flat, page_banks):
+        draw(ax, by_bank[bank], spec.options)
         ax.set_title(bank)
-        ax.set_xlabel("Count")
-        ax.invert_yaxis()  # highest at top
+    for ax in flat[n:]:
+        ax.set_visible(False)
 
-    fig.suptitle("Top Themes per Bank")
+    title = spec.title
+    if spec.n_pages() > 1:
+        title = f"{title} ({page}/{spec.n_pages()})"
+    fig.suptitle(title)
     fig.tight_layout()
-    out_path = os.path.join(FIG_DIR, "themes_per_bank.png")
-    plt.savefig(out_path, dpi=200)
+    out_path = spec.out_path(page, fig_dir)
+    fig.savefig(out_path, dpi=dpi)
     plt.close(fig)
-    print(f"[INFO] Saved: {out_path}")
+    return out_path
 
 
-def plot_top_keywords_per_bank(keywords_df: pd.DataFrame, top_n: int = 10) -> None:
-    """Plot top TF-IDF keywords per bank (bar chart)."""
-    ensure_fig_dir()
+# --------------------------------------------------------------------
+# Figure set + change-aware parallel rendering
+# --------------------------------------------------------------------
+
+def build_figure_specs(aggregates: Dict[str, pd.DataFrame], keywords_df: pd.DataFrame,
+                       top_n: int = 10) -> List[FigureSpec]:
+    ratings = aggregates["rating"]
+    specs = [
+        FigureSpec(
+            "rating_distribution_per_bank", "Rating Distribution per Bank", "rating",
+            ratings,
+            {"ratings": sorted(int(r) for r in ratings["rating"].dropna().unique())},
+            sharey=True,
+        ),
+        FigureSpec(
+            "sentiment_distribution_per_bank", "Sentiment Distribution per Bank", "sentiment",
+            aggregates["sentiment"], {}, sharey=True,
+        ),
+    ]
+
+    if "themes" in aggregates:
+        specs.append(FigureSpec(
+            "themes_per_bank", "Top Themes per Bank", "themes", aggregates["themes"], {},
+            panel_size=(6, 5),
+        ))
+    else:
+        print("[WARN] 'themes' column not found. Skipping theme plot.")
 
     required_cols = {"bank_name", "keyword", "rank"}
     missing = required_cols - set(keywords_df.columns)
     if missing:
         raise ValueError(f"keywords_per_bank.csv missing columns: {missing}")
+    specs.append(FigureSpec(
+        "top_keywords_per_bank", f"Top {top_n} Keywords per Bank", "keywords",
+        keywords_df[["bank_name", "keyword", "rank"]].reset_index(drop=True),
+        {"top_n": top_n}, panel_size=(6, 5),
+    ))
 
-    banks = keywords_df["bank_name"].unique()
-    n_banks = len(banks)
-    fig, axes = plt.subplots(1, n_banks, figsize=(6 * n_banks, 5), sharey=False)
+    if "topics" in aggregates:
+        specs.append(FigureSpec(
+            "discovered_topics_per_bank", "Discovered Complaint Topics per Bank", "topics",
+            aggregates["topics"], {}, panel_size=(6, 5),
+        ))
+    return specs
 
-    if n_banks == 1:
-        axes = [axes]
 
-    for ax, bank in zip(axes, banks):
-        sub = keywords_df[keywords_df["bank_name"] == bank]
-        sub = sub.sort_values("rank").head(top_n)
-        ax.barh(sub["keyword"], top_n - sub["rank"] + 1)  # simple score
-        ax.set_title(bank)
-        ax.set_xlabel("Keyword Importance (relative)")
-        ax.invert_yaxis()
+def load_manifest(fig_dir: str = FIG_DIR) -> Dict[str, Any]:
+    path = os.path.join(fig_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
 
-    fig.suptitle(f"Top {top_n} Keywords per Bank")
-    fig.tight_layout()
-    out_path = os.path.join(FIG_DIR, "top_keywords_per_bank.png")
-    plt.savefig(out_path, dpi=200)
-    plt.close(fig)
-    print(f"[INFO] Saved: {out_path}")
+
+def save_manifest(manifest: Dict[str, Any], fig_dir: str = FIG_DIR) -> None:
+    with open(os.path.join(fig_dir, MANIFEST_NAME), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+
+
+def render_figures(specs: List[FigureSpec], force: bool = False,
+                   workers: Optional[int] = None, dpi: int = DPI,
+                   fig_dir: str = FIG_DIR) -> List[str]:
+    """
+    Render every figure whose aggregate changed since the last run.
+    Figures with no data (e.g. filters that match nothing) are skipped.
+
+    Returns the list of files written.
+    """
+    ensure_fig_dir(fig_dir)
+    manifest = load_manifest(fig_dir)
+
+    for spec in [s for s in specs if s.data.empty]:
+        print(f"[WARN] No data for {spec.name}, skipping it.")
+    specs = [s for s in specs if not s.data.empty]
+
+    todo: List[Tuple[FigureSpec, str]] = []
+    for spec in specs:
+        digest = spec.input_hash(dpi)
+        previous = manifest.get(spec.name, {})
+        files = [spec.out_path(p, fig_dir) for p in range(1, spec.n_pages() + 1)]
+        if not force and previous.get("hash") == digest and all(os.path.exists(f) for f in files):
+            print(f"[INFO] Unchanged, skipped: {spec.name}")
+            continue
+        todo.append((spec, digest))
+
+    jobs = [(spec, page) for spec, _ in todo for page in range(1, spec.n_pages() + 1)]
+    written: List[str] = []
+    if jobs:
+        if workers == 1 or len(jobs) == 1:
+            written = [render_page(spec, page, dpi, fig_dir) for spec, page in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(render_page, spec, page, dpi, fig_dir) for spec, page in jobs]
+                written = [f.result() for f in futures]
+
+    for spec, digest in todo:
+        files = [spec.out_path(p, fig_dir) for p in range(1, spec.n_pages() + 1)]
+        # drop pages left over from a previous run with more banks
+        for stale in set(manifest.get(spec.name, {}).get("files", [])) - set(files):
+            if os.path.exists(stale):
+                os.remove(stale)
+        manifest[spec.name] = {"hash": digest, "files": files}
+
+    save_manifest(manifest, fig_dir)
+    for path in written:
+        print(f"[INFO] Saved: {path}")
+    return written
 
 
 # --------------------------------------------------------------------
@@ -243,15 +536,38 @@ def plot_top_keywords_per_bank(keywords_df: pd.DataFrame, top_n: int = 10) -> No
 # --------------------------------------------------------------------
 
 def main() -> None:
-    print("=== Task 4 – Insights & Visualizations ===")
-    reviews_df, keywords_df = load_datasets()
-
-    print(f"[INFO] Loaded {len(reviews_df)} reviews and {len(keywords_df)} keyword rows.")
+    parser = argparse.ArgumentParser(description="Task 4 – Insights & Visualizations")
+    parser.add_argument("--force", action="store_true", help="redraw figures even if unchanged")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--dpi", type=int, default=DPI)
+    parser.add_argument("--source", choices=["csv", "db"], default="csv",
+                        help="processed CSVs (default) or the PostgreSQL tables")
+    parser.add_argument("--banks", nargs="+", help="bank codes to include, e.g. CBE BOA")
+    parser.add_argument("--since", help="only reviews on/after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", help="only reviews before this date (YYYY-MM-DD)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="rows per fetch with --source db")
+    args = parser.parse_args()
 
-    plot_rating_distribution(reviews_df)
-    plot_sentiment_distribution(reviews_df)
-    plot_themes_per_bank(reviews_df)
-    plot_top_keywords_per_bank(keywords_df, top_n=10)
+    print("=== Task 4 – Insights & Visualizations ===")
+    if args.source == "db":
+        aggregates, keywords_df = load_aggregates_from_db(
+            args.banks, args.since, args.until, chunk_size=args.chunk_size
+        )
+    else:
+        reviews_df, keywords_df = load_datasets()
+        reviews_df = filter_reviews(reviews_df, args.banks, args.since, args.until)
+        if args.banks and "bank_code" in keywords_df.columns:
+            keywords_df = keywords_df[keywords_df["bank_code"].isin(args.banks)]
+        print(f"[INFO] Loaded {len(reviews_df)} reviews and {len(keywords_df)} keyword rows.")
+        aggregates = aggregate_reviews(reviews_df)
+
+    topics = load_topic_counts(args.banks)
+    if topics is not None:
+        aggregates["topics"] = topics
+
+    specs = build_figure_specs(aggregates, keywords_df, top_n=10)
+    render_figures(specs, force=args.force, workers=args.workers, dpi=args.dpi)
 
     print("\n[OK] Task 4 plots generated in 'figures/' directory.")
     print("Use these plots in your Week 2 final report for insights & recommendations.")
@@ -0,0 +1,274 @@
+"""
+topic_discovery.py
+Unsupervised complaint clustering, so new complaint types show up without
+anyone adding a keyword to the hand-maintained `themes`.
+
+- Features come from the shared token cache in chunks: stop words dropped,
+  token ids folded into a fixed number of columns (so the feature space does
+  not change as the vocabulary grows), weighted by a running IDF and L2
+  normalized.
+- MiniBatchKMeans is trained with partial_fit one chunk at a time, so memory
+  is bounded by the chunk size, not the history.
+- State (model, IDF counts, labels, per-cluster term counts) is persisted;
+  the next run only processes reviews added to the token cache since.
+  Labels line up with cache rows by position, so the state also records how
+  many rows it covers and a checksum of their keys; if the cache was rebuilt
+  or reordered since, the model is refit from scratch.
+
+Outputs (data/processed/topics/):
+    cluster_terms.csv      cluster, rank, term, weight, n_reviews
+    clusters_per_bank.csv  bank_code, bank_name, cluster, label, count
+                           (read by task4_insights_visualization.py)
+
+Usage:
+    python src/topic_discovery.py            # incremental update
+    python src/topic_discovery.py --reassign # relabel all reviews with current centroids
+    python src/topic_discovery.py --refit    # start over
+"""
+
+import argparse
+import hashlib
+import os
+from typing import Dict, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from sklearn.preprocessing import normalize
+
+from config import DATA_PATHS, TOPIC_CONFIG
+from preprocessing import TokenCache
+
+
+TERMS_FILE = "cluster_terms.csv"
+PER_BANK_FILE = "clusters_per_bank.csv"
+
+
+def _key_checksum(cache: TokenCache, n_rows: int) -> str:
+    """Checksum of the review keys of the first n_rows cache rows, in order."""
+    keys = cache.meta["key"].iloc[:n_rows].astype(str)
+    return hashlib.blake2b("\n".join(keys).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _usable_tokens(vocab) -> np.ndarray:
+    return np.array([
+        len(tok) > 2 and not tok.isdigit() and tok not in ENGLISH_STOP_WORDS
+        for tok in vocab
+    ], dtype=bool)
+
+
+class TopicModel:
+    def __init__(self, topics_dir: str = DATA_PATHS["topics_dir"]) -> None:
+        self.topics_dir = topics_dir
+        self.n_features = TOPIC_CONFIG["n_features"]
+        self.n_clusters = TOPIC_CONFIG["n_clusters"]
+        self.kmeans = MiniBatchKMeans(n_clusters=self.n_clusters, batch_size=2048,
+                                      n_init=3, random_state=0)
+        self.fitted = False
+        self.doc_freq = np.zeros(self.n_features, dtype=np.int64)
+        self.n_docs = 0
+        self.labels = np.zeros(0, dtype=np.int32)
+        self.term_counts = np.zeros((self.n_clusters, 0), dtype=np.int64)
+        self.key_checksum: Optional[str] = None
+
+    # ---------- persistence ----------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.topics_dir, name)
+
+    @classmethod
+    def load(cls, topics_dir: str = DATA_PATHS["topics_dir"]) -> "TopicModel":
+        model = cls(topics_dir)
+        if not os.path.exists(model._path("state.joblib")):
+            return model
+        state = joblib.load(model._path("state.joblib"))
+        model.kmeans = state["kmeans"]
+        model.fitted = True
+        model.doc_freq = state["doc_freq"]
+        model.n_docs = state["n_docs"]
+        model.n_features = state["n_features"]
+        model.n_clusters = model.kmeans.n_clusters
+        model.key_checksum = state.get("key_checksum")
+        model.labels = np.load(model._path("labels.npy"))
+        model.term_counts = np.load(model._path("term_counts.npy"))
+        return model
+
+    def save(self) -> None:
+        os.makedirs(self.topics_dir, exist_ok=True)
+        joblib.dump({
+            "kmeans": self.kmeans,
+            "doc_freq": self.doc_freq,
+            "n_docs": self.n_docs,
+            "n_features": self.n_features,
+            "n_rows": len(self.labels),
+            "key_checksum": self.key_checksum,
+        }, self._path("state.joblib"))
+        np.save(self._path("labels.npy"), self.labels)
+        np.save(self._path("term_counts.npy"), self.term_counts)
+
+    def matches(self, cache: TokenCache) -> bool:
+        """True when the stored labels still belong to the first cache rows."""
+        if not len(self.labels):
+            return True
+        return (len(self.labels) <= len(cache)
+                and self.key_checksum == _key_checksum(cache, len(self.labels)))
+
+    # ---------- features ----------
+
+    def _counts(self, cache: TokenCache, start: int, stop: int) -> sparse.csr_matrix:
+        """Chunk counts with stop words zeroed (vocab-sized columns)."""
+        counts = cache.count_matrix(start, stop)
+        keep = _usable_tokens(cache.vocab).astype(np.float32)
+        return (counts @ sparse.diags(keep)).tocsr()
+
+    def _features(self, counts: sparse.csr_matrix, update_idf: bool) -> sparse.csr_matrix:
+        vocab_size = counts.shape[1]
+        ids = np.arange(vocab_size)
+        fold = sparse.csr_matrix(
+            (np.ones(vocab_size, dtype=np.float32), (ids, ids % self.n_features)),
+            shape=(vocab_size, self.n_features),
+        )
+        X = (counts @ fold).tocsr()
+        X.eliminate_zeros()
+
+        if update_idf:
+            self.doc_freq += np.bincount(X.indices, minlength=self.n_features)
+            self.n_docs += X.shape[0]
+        idf = np.log((1 + self.n_docs) / (1 + self.doc_freq)) + 1.0
+
+        X.data = np.log1p(X.data)  # sublinear tf
+        X = X @ sparse.diags(idf.astype(np.float32))
+        return normalize(X.tocsr())
+
+    def _add_term_counts(self, counts: sparse.csr_matrix, labels: np.ndarray) -> None:
+        vocab_size = counts.shape[1]
+        if self.term_counts.shape[1] < vocab_size:
+            grow = vocab_size - self.term_counts.shape[1]
+            self.term_counts = np.pad(self.term_counts, ((0, 0), (0, grow)))
+        onehot = sparse.csr_matrix(
+            (np.ones(len(labels)), (labels, np.arange(len(labels)))),
+            shape=(self.n_clusters, len(labels)),
+        )
+        self.term_counts[:, :vocab_size] += (onehot @ counts).toarray().astype(np.int64)
+
+    # ---------- training ----------
+
+    def update(self, cache: TokenCache, chunk_size: int = TOPIC_CONFIG["chunk_size"]) -> int:
+        """partial_fit on reviews added since the last run; returns how many were processed."""
+        start = len(self.labels)
+        stop = len(cache)
+        if stop - start <= 0:
+            return 0
+
+        new_labels = []
+        for lo in range(start, stop, chunk_size):
+            hi = min(lo + chunk_size, stop)
+            # keep every batch big enough for the number of clusters
+            if stop - hi < self.n_clusters:
+                hi = stop
+            counts = self._counts(cache, lo, hi)
+            X = self._features(counts, update_idf=True)
+            if X.shape[0] >= self.n_clusters or self.fitted:
+                self.kmeans.partial_fit(X)
+                self.fitted = True
+            if not self.fitted:
+                raise ValueError(
+                    f"Need at least {self.n_clusters} reviews to start clustering, got {X.shape[0]}."
+                )
+            labels = self.kmeans.predict(X).astype(np.int32)
+            self._add_term_counts(counts, labels)
+            new_labels.append(labels)
+            if hi == stop:
+                break
+
+        self.labels = np.concatenate([self.labels] + new_labels)
+        self.key_checksum = _key_checksum(cache, len(self.labels))
+        return stop - start
+
+    def reassign(self, cache: TokenCache, chunk_size: int = TOPIC_CONFIG["chunk_size"]) -> None:
+        """Relabel every review with the current centroids and recount terms."""
+        self.term_counts = np.zeros((self.n_clusters, len(cache.vocab)), dtype=np.int64)
+        labels = []
+        for lo in range(0, len(self.labels), chunk_size):
+            hi = min(lo + chunk_size, len(self.labels))
+            counts = self._counts(cache, lo, hi)
+            chunk_labels = self.kmeans.predict(self._features(counts, update_idf=False)).astype(np.int32)
+            self._add_term_counts(counts, chunk_labels)
+            labels.append(chunk_labels)
+        self.labels = np.concatenate(labels) if labels else self.labels
+
+    # ---------- outputs ----------
+
+    def cluster_terms(self, cache: TokenCache, top_n: int = TOPIC_CONFIG["top_terms"]) -> pd.DataFrame:
+        """
+        Top terms per cluster by class-based TF-IDF: a term ranks high when it
+        is frequent in the cluster and rare across clusters.
+        """
+        tc = self.term_counts.astype(np.float64)
+        tc[:, ~_usable_tokens(cache.vocab[:tc.shape[1]])] = 0
+        per_cluster = tc.sum(axis=1, keepdims=True)
+        tf = np.divide(tc, per_cluster, out=np.zeros_like(tc), where=per_cluster > 0)
+        avg_words = per_cluster.mean()
+        term_total = tc.sum(axis=0)
+        weight = tf * np.log1p(np.divide(avg_words, term_total,
+                                         out=np.zeros_like(term_total), where=term_total > 0))
+
+        sizes = np.bincount(self.labels, minlength=self.n_clusters)
+        rows = []
+        for c in range(self.n_clusters):
+            top = np.argsort(-weight[c])[:top_n]
+            for rank, tid in enumerate(top[weight[c, top] > 0], start=1):
+                rows.append({"cluster": c, "rank": rank, "term": cache.vocab[tid],
+                             "weight": float(weight[c, tid]), "n_reviews": int(sizes[c])})
+        return pd.DataFrame(rows, columns=["cluster", "rank", "term", "weight", "n_reviews"])
+
+    def clusters_per_bank(self, cache: TokenCache, terms: pd.DataFrame) -> pd.DataFrame:
+        labels: Dict[int, str] = (
+            terms[terms["rank"] <= 3].groupby("cluster")["term"].apply(" / ".join).to_dict()
+        )
+        meta = cache.meta.iloc[:len(self.labels)][["key", "bank_code", "bank_name"]].copy()
+        meta["cluster"] = self.labels
+        out = (
+            meta.groupby(["bank_code", "bank_name", "cluster"])["key"]
+            .nunique()
+            .reset_index(name="count")
+        )
+        out["label"] = out["cluster"].map(labels).fillna(out["cluster"].map("cluster {}".format))
+        return out[["bank_code", "bank_name", "cluster", "label", "count"]]
+
+    def write_outputs(self, cache: TokenCache) -> None:
+        terms = self.cluster_terms(cache)
+        per_bank = self.clusters_per_bank(cache, terms)
+        terms.to_csv(self._path(TERMS_FILE), index=False)
+        per_bank.to_csv(self._path(PER_BANK_FILE), index=False)
+        print(f"Saved → {self._path(TERMS_FILE)}")
+        print(f"Saved → {self._path(PER_BANK_FILE)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Discover complaint topics by streaming clustering")
+    parser.add_argument("--reassign", action="store_true", help="relabel all reviews with current centroids")
+    parser.add_argument("--refit", action="store_true", help="discard saved state and start over")
+    args = parser.parse_args()
+
+    cache = TokenCache.load()
+    model = TopicModel() if args.refit else TopicModel.load()
+    if not model.matches(cache):
+        print("[WARN] Token cache changed since the last run (rebuilt or reordered); refitting.")
+        model = TopicModel()
+
+    n = model.update(cache)
+    print(f"[INFO] Clustered {n} new review(s); {len(model.labels)} total in {model.n_clusters} clusters.")
+    if args.reassign:
+        model.reassign(cache)
+        print("[INFO] Reassigned all reviews to the current centroids.")
+
+    model.save()
+    model.write_outputs(cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+validation.py
+Batch validation for review data before it is processed or loaded.
+
+Every rule is a vectorized column check over the whole DataFrame. Rows that
+fail any rule are split off in the same pass and written to a quarantine
+CSV together with their reason codes, instead of surfacing later as
+individual insert errors.
+
+Reason codes:
+    MISSING_REVIEW_ID   review_id empty
+    DUPLICATE_REVIEW_ID review_id repeated within the batch
+    MISSING_TEXT        review_text empty or whitespace only
+    TEXT_TOO_LONG       review_text longer than max_text_length
+    BAD_RATING          rating not an integer in [rating_min, rating_max]
+    BAD_DATE            review_date missing or unparseable
+    UNKNOWN_BANK        bank_code not in the banks table / BANK_NAMES
+    BAD_THUMBS_UP       thumbs_up present but not a non-negative number
+    <COL>_TOO_LONG      value longer than its VARCHAR column (e.g. USER_NAME_TOO_LONG)
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import DATA_PATHS, VALIDATION_CONFIG
+
+
+REASON_COLUMN = "reject_reasons"
+
+
+def _str_len(series: pd.Series) -> pd.Series:
+    return series.astype("string").str.len().fillna(0)
+
+
+def review_checks(df: pd.DataFrame, known_banks: Iterable[str],
+                  require_review_id: bool = True) -> Dict[str, pd.Series]:
+    """Return {reason_code: boolean mask of failing rows}."""
+    cfg = VALIDATION_CONFIG
+    checks: Dict[str, pd.Series] = {}
+    false = pd.Series(False, index=df.index)
+
+    if require_review_id:
+        ids = df["review_id"] if "review_id" in df.columns else pd.Series(pd.NA, index=df.index)
+        missing_id = ids.isna() | (ids.astype("string").str.strip() == "")
+        checks["MISSING_REVIEW_ID"] = missing_id.fillna(True)
+        checks["DUPLICATE_REVIEW_ID"] = ids.duplicated(keep="first") & ~missing_id
+
+    text = df["review_text"] if "review_text" in df.columns else pd.Series(pd.NA, index=df.index)
+    checks["MISSING_TEXT"] = (text.isna() | (text.astype("string").str.strip() == "")).fillna(True)
+    checks["TEXT_TOO_LONG"] = _str_len(text) > cfg["max_text_length"]
+
+    rating = pd.to_numeric(df.get("rating", pd.Series(np.nan, index=df.index)), errors="coerce")
+    checks["BAD_RATING"] = ~(
+        rating.between(cfg["rating_min"], cfg["rating_max"]) & (rating % 1 == 0)
+    )
+
+    dates = pd.to_datetime(df.get("review_date", pd.Series(pd.NaT, index=df.index)),
+                           errors="coerce", format="mixed")
+    checks["BAD_DATE"] = dates.isna()
+
+    banks = df["bank_code"] if "bank_code" in df.columns else pd.Series(pd.NA, index=df.index)
+    checks["UNKNOWN_BANK"] = ~banks.isin(set(known_banks))
+
+    if "thumbs_up" in df.columns:
+        thumbs = pd.to_numeric(df["thumbs_up"], errors="coerce")
+        checks["BAD_THUMBS_UP"] = df["thumbs_up"].notna() & ~(thumbs >= 0)
+    else:
+        checks["BAD_THUMBS_UP"] = false
+
+    for col, limit in cfg["max_lengths"].items():
+        if col in df.columns:
+            checks[f"{col.upper()}_TOO_LONG"] = _str_len(df[col]) > limit
+
+    return checks
+
+
+def validate_reviews(df: pd.DataFrame, known_banks: Iterable[str],
+                     require_review_id: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Split a batch into (valid, rejected) in one pass.
+
+    valid has rating as int and review_date as datetime; rejected keeps the
+    original values plus a `reject_reasons` column ("BAD_RATING;UNKNOWN_BANK").
+    """
+    checks = review_checks(df, known_banks, require_review_id)
+
+    reasons = np.full(len(df), "", dtype=object)
+    for code, mask in checks.items():
+        reasons = np.where(mask.to_numpy(dtype=bool), reasons + code + ";", reasons)
+    bad = reasons != ""
+
+    rejected = df[bad].copy()
+    rejected[REASON_COLUMN] = pd.Series(reasons[bad], index=rejected.index).str.rstrip(";")
+
+    valid = df[~bad].copy()
+    # a batch missing either column has every row rejected, so only cast when rows survived
+    if not valid.empty:
+        valid["rating"] = pd.to_numeric(valid["rating"]).astype(int)
+        valid["review_date"] = pd.to_datetime(valid["review_date"], format="mixed")
+    return valid, rejected
+
+
+def reason_summary(rejected: pd.DataFrame) -> pd.Series:
+    """Count of rejected rows per reason code."""
+    if rejected.empty:
+        return pd.Series(dtype=int)
+    return rejected[REASON_COLUMN].str.split(";").explode().value_counts()
+
+
+def write_quarantine(rejected: pd.DataFrame, stage: str,
+                     quarantine_dir: Optional[str] = None) -> Optional[str]:
+    """Append rejected rows to <quarantine_dir>/<stage>_rejects.csv."""
+    if rejected.empty:
+        return None
+
+    quarantine_dir = quarantine_dir or DATA_PATHS["quarantine_dir"]
+    os.makedirs(quarantine_dir, exist_ok=True)
+    path = os.path.join(quarantine_dir, f"{stage}_rejects.csv")
+
+    out = rejected.assign(stage=stage, quarantined_at=datetime.utcnow().isoformat())
+    out.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+    print(f"[WARN] {len(rejected)} row(s) quarantined → {path}")
+    for code, n in reason_summary(rejected).items():
+        print(f"         {code}: {n}")
+    return path